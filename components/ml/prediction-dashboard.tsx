@@ -307,7 +307,7 @@ export function PredictionDashboard({ symbol }: PredictionDashboardProps) {
               </div>
               <div className="text-right">
                 <p className="text-xs text-muted-foreground">Ensemble Models</p>
-                <p className="text-sm font-semibold">Ridge • Lasso • RF • GBM • ARIMA • ES</p>
+                <p className="text-sm font-semibold">Ridge • Lasso • RF • GBM • AR • ES</p>
               </div>
             </div>
           </div>
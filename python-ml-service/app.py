@@ -3,34 +3,65 @@ FastAPI Service for ML Stock/ETF Price Predictions & Stock Data
 Professional-grade ML predictions with comprehensive stock data endpoints
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import yfinance as yf
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import AfterValidator, BaseModel
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Annotated, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Literal, Mapping, Optional, Set, Tuple, Union
+import asyncio
+import orjson
+import hashlib
+import re
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from collections import defaultdict
+from functools import lru_cache, wraps
+from itertools import islice
+from types import MappingProxyType
 import time
-import requests
+import httpx
 import os
+from concurrent.futures import ProcessPoolExecutor
 from groq import Groq
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from feature_engineering import engineer_dataset, normalize_features, extract_features
-from models import MLEnsemble, TimeSeriesModels, evaluate_model
+# Logging: request paths only enqueue records; a background listener thread
+# formats and writes them. Set LOG_LEVEL=DEBUG for per-step details.
+logger = logging.getLogger('quantpilot.ml')
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+_log_listener = QueueListener(_log_queue, _log_stream)
+logger.addHandler(QueueHandler(_log_queue))
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+logger.propagate = False
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+from feature_engineering import WARMUP_BARS, engineer_dataset, extract_features, prepare_training_data
+from models import MLEnsemble, set_fit_n_jobs, train_ml_ensemble, train_time_series, evaluate_model
 from backtesting import Backtester
 from stock_data import StockDataFetcher
 from technical_indicators import TechnicalIndicators
 from cache import cache
+from chat_sessions import chat_sessions
+from model_cache import MARKET_TZ, ModelCache, model_cache
 
 app = FastAPI(
     title="QuantPilot ML & Stock Data Service",
     version="2.0.0",
-    description="Unified Python backend for stock data, technical indicators, and ML predictions"
+    description="Unified Python backend for stock data, technical indicators, and ML predictions",
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS
@@ -49,9 +80,315 @@ app.add_middleware(
 # Initialize services
 stock_fetcher = StockDataFetcher(cache_ttl=300)
 
+# Uvicorn worker processes (see __main__); each one imports this module
+SERVER_WORKERS = int(os.getenv("MAX_WORKERS", max(2, (os.cpu_count() or 2) // 2)))
+
+# Worker processes for CPU-bound feature engineering and model training. The
+# cores are split between the server workers' pools, and each training process
+# fits single-threaded, so the box runs about one training thread per core
+_POOL_WORKERS = max(1, min(4, (os.cpu_count() or 1) // SERVER_WORKERS))
+
+
+def _init_pool_worker():
+    """Pool process setup: single-threaded fits, and direct logging (the queue
+    listener thread doesn't survive the fork)"""
+    set_fit_n_jobs(1)
+    logger.handlers = [_log_stream]
+
+
+_pool = ProcessPoolExecutor(max_workers=_POOL_WORKERS, initializer=_init_pool_worker)
+
+
+@app.on_event("startup")
+async def open_http_client():
+    """Shared keep-alive HTTP client for outbound API calls"""
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, keepalive_expiry=60)
+    )
+    # Concurrent Finnhub requests across all symbols (created here so it binds to the serving loop)
+    app.state.finnhub_slots = asyncio.Semaphore(int(os.getenv('FINNHUB_CONCURRENCY', 20)))
+    # One Groq client (and its connection pool) for all chat requests; None without an API key
+    groq_api_key = os.getenv('GROQ_API_KEY')
+    app.state.groq = Groq(api_key=groq_api_key) if groq_api_key else None
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+    if app.state.groq is not None:
+        app.state.groq.close()
+
+
+@app.on_event("startup")
+async def warmup_models():
+    """Fit a throwaway ensemble in every training worker so the first /predict skips extension loading"""
+    try:
+        await asyncio.gather(*(
+            asyncio.wrap_future(_pool.submit(MLEnsemble()._warmup))
+            for _ in range(_POOL_WORKERS)
+        ))
+        logger.info("Model warmup complete (%d workers)", _POOL_WORKERS)
+    except Exception as e:
+        logger.warning("Model warmup failed: %s", e)
+
+
+async def _fetch_history(symbol: str, days: int) -> pd.DataFrame:
+    """Fetch historical data on a worker thread so the event loop stays free"""
+    return await asyncio.to_thread(stock_fetcher.fetch_historical_data, symbol, days=days)
+
+
+async def _fetch_spy_history(days: int) -> Optional[pd.DataFrame]:
+    """Fetch SPY history for market-relative features, None if unavailable"""
+    try:
+        return await _fetch_history('SPY', days)
+    except Exception as e:
+        logger.warning("Could not fetch SPY data: %s", e)
+        return None
+
+
+async def _fetch_with_spy(symbol: str, days: int) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Fetch a symbol together with SPY in one batched download
+
+    SPY is None when the symbol is SPY itself or SPY data is unavailable.
+    """
+    if symbol == 'SPY':
+        return await _fetch_history(symbol, days), None
+
+    try:
+        frames = await asyncio.to_thread(stock_fetcher.fetch_historical_data_multi, [symbol, 'SPY'], days)
+    except Exception as e:
+        logger.warning("Batched download failed, fetching individually: %s", e)
+        frames = {}
+
+    # Fall back to the single-symbol path (with retries) for anything the batch
+    # missed, fetching both concurrently when both are missing
+    df = frames.get(symbol)
+    spy_df = frames.get('SPY')
+    if df is None and spy_df is None:
+        df, spy_df = await asyncio.gather(_fetch_history(symbol, days), _fetch_spy_history(days))
+    elif df is None:
+        df = await _fetch_history(symbol, days)
+    elif spy_df is None:
+        spy_df = await _fetch_spy_history(days)
+    return df, spy_df
+
+
+async def _get_live_price(symbol: str) -> Optional[float]:
+    """
+    Real-time price, cached for 15 seconds
+
+    Cache hits return without leaving the event loop; misses hit Yahoo on a
+    worker thread.
+
+    Returns:
+        Latest price, or None if unavailable
+    """
+    price = cache.get(f"px:{symbol}")
+    if price is not None:
+        return price
+    return await asyncio.to_thread(_fetch_live_price, symbol)
+
+
+async def _get_quote_type(symbol: str) -> str:
+    """
+    Yahoo quoteType (EQUITY, ETF, ...) for a symbol
+
+    Known popular symbols are answered from the static mapping; others are
+    looked up once and cached for a day.
+    """
+    quote_type = POPULAR_QUOTE_TYPES.get(symbol)
+    if quote_type is not None:
+        return quote_type
+
+    cache_key = f"qtype:{symbol}"
+    quote_type = cache.get(cache_key)
+    if quote_type is None:
+        quote_type = await _fetch_quote_type(symbol)
+        if quote_type is None:
+            # Yahoo's search API didn't know the symbol; ask yfinance on a worker thread
+            info = await asyncio.to_thread(lambda: stock_fetcher.get_ticker(symbol).info)
+            quote_type = info.get('quoteType', 'EQUITY')
+        cache.set(cache_key, quote_type, ttl=86400)
+    return quote_type
+
+
+YAHOO_SEARCH_URL = "https://query2.finance.yahoo.com/v1/finance/search"
+
+
+async def _fetch_quote_type(symbol: str) -> Optional[str]:
+    """
+    Look up a symbol's quoteType on the shared async HTTP client
+
+    Uses Yahoo's search API, which needs no cookie/crumb, so the lookup never
+    takes a thread from the pool. Returns None if the request fails or no
+    quote matches the symbol exactly.
+    """
+    try:
+        response = await app.state.http.get(
+            YAHOO_SEARCH_URL,
+            params={"q": symbol, "quotesCount": 5, "newsCount": 0},
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=5,
+        )
+        response.raise_for_status()
+        quotes = response.json().get('quotes', [])
+    except (httpx.HTTPError, ValueError) as e:
+        logger.debug("Quote type lookup failed for %s: %s", symbol, e)
+        return None
+
+    return next((q.get('quoteType') for q in quotes if q.get('symbol') == symbol and q.get('quoteType')), None)
+
+
+def _fetch_live_price(symbol: str) -> Optional[float]:
+    """
+    Fetch and cache the real-time price from fast_info
+
+    The slower .info lookup is only tried when fast_info raises.
+    """
+    ticker = stock_fetcher.get_ticker(symbol)
+    try:
+        price = ticker.fast_info.get('lastPrice')
+        source = 'fast_info'
+    except Exception as e:
+        logger.debug("fast_info failed for %s, trying info: %s", symbol, e)
+        try:
+            info = ticker.info
+            price = info.get('currentPrice') or info.get('regularMarketPrice')
+            source = 'info'
+        except Exception as e2:
+            logger.warning("Could not fetch real-time price, using last close: %s", e2)
+            return None
+
+    if price is None:
+        return None
+
+    price = float(price)
+    logger.debug("Real-time price: $%.2f (from %s)", price, source)
+    cache.set(f"px:{symbol}", price, ttl=15)
+    return price
+
+
+def _cache_json(key: str, payload: Dict, ttl: int, stale_ttl: int = 0) -> bytes:
+    """
+    Encode a response once and cache the bytes, so hits skip serialization
+
+    Cached responses are always immutable bytes, never the payload dict, so a
+    hit can be returned as-is without a defensive copy.
+    """
+    raw = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    cache.set(key, raw, ttl=ttl, stale_ttl=stale_ttl)
+    return raw
+
+
+def _last_close(df: pd.DataFrame) -> float:
+    """Most recent close, read from the underlying array rather than via a pandas indexer"""
+    return df['close'].to_numpy()[-1]
+
+
+def _json_response(raw: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wrap pre-encoded JSON bytes in a response"""
+    return Response(content=raw, media_type="application/json", headers=headers)
+
+
+def _payload(result: Union[Response, Dict]) -> Dict:
+    """Decoded body of an endpoint's result, for handlers that call other handlers"""
+    return orjson.loads(result.body) if isinstance(result, Response) else result
+
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NDJSON = "application/x-ndjson"
+EVENT_STREAM = "text/event-stream"
+
+
+def _arrow_ipc(df: pd.DataFrame) -> bytes:
+    """Encode a DataFrame as an Arrow IPC stream, column buffers copied as-is"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _ndjson(rows: Iterable[Dict], batch_size: int = 256) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON, flushing a batch of lines per chunk"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield b''.join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in batch)
+
+
+# In-flight cache fills by key, so concurrent misses share a single upstream fetch
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _fill_cache(key: str, build: Callable[[], Awaitable[Dict]], ttl: int) -> asyncio.Task:
+    """Start (or join) the single task that rebuilds and caches a response"""
+    task = _inflight.get(key)
+    if task is not None:
+        return task
+
+    async def fill() -> bytes:
+        # Keep serving this value as stale for another TTL while it is refreshed
+        return _cache_json(key, await build(), ttl, stale_ttl=ttl)
+
+    def done(t: asyncio.Task):
+        if _inflight.get(key) is t:
+            del _inflight[key]
+        if not t.cancelled() and t.exception() is not None:
+            logger.warning("Cache fill failed for %s: %s", key, t.exception())
+
+    task = asyncio.create_task(fill())
+    _inflight[key] = task
+    task.add_done_callback(done)
+    return task
+
+
+async def _cached_json(key: str, build: Callable[[], Awaitable[Dict]], ttl: int) -> bytes:
+    """
+    Stale-while-revalidate response cache
+
+    Fresh hits return immediately. Stale hits (up to 2x TTL) also return
+    immediately while one background task refreshes the entry. Misses wait
+    on a single shared fill, so an expiry never stampedes the upstream API.
+
+    Args:
+        key: Cache key
+        build: Coroutine function producing the response payload on a miss
+        ttl: Time to live in seconds
+
+    Returns:
+        Encoded JSON bytes
+    """
+    raw, is_stale = cache.get_with_state(key)
+    if raw is None:
+        # Shielded so a disconnecting client doesn't cancel the fill for other waiters
+        return await asyncio.shield(_fill_cache(key, build, ttl))
+    if is_stale:
+        _fill_cache(key, build, ttl)
+    return raw
+
+
+SYMBOL_PATTERN = re.compile(r'[A-Z0-9.\-^=]{1,15}')
+
+
+@lru_cache(maxsize=1024)
+def _normalize_symbol(value: str) -> str:
+    """Upper-case and validate a ticker symbol (e.g. AAPL, BRK.B, ^GSPC, BTC-USD)"""
+    symbol = value.strip().upper()
+    if not SYMBOL_PATTERN.fullmatch(symbol):
+        raise ValueError(f"Invalid ticker symbol: {value!r}")
+    return symbol
+
+
+# Request field type: arrives upper-cased and validated, so handlers use it as-is
+Symbol = Annotated[str, AfterValidator(_normalize_symbol)]
+
 
 class PredictionRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
 
 
 class PredictionResponse(BaseModel):
@@ -69,30 +406,31 @@ class PredictionResponse(BaseModel):
 
 
 class HistoricalRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
     days: Optional[int] = 730
+    format: Literal['records', 'columnar'] = 'records'  # columnar: {column: [values]}
 
 
 class QuoteRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
 
 
 class FundamentalsRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
 
 
 class IndicatorsRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
     days: Optional[int] = 200
 
 
 class FeaturesRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
     days: Optional[int] = 730
 
 
 class NewsRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
 
 
 class SearchRequest(BaseModel):
@@ -100,20 +438,25 @@ class SearchRequest(BaseModel):
 
 
 class SignalsRequest(BaseModel):
-    symbol: str
+    symbol: Symbol
     data: Dict[str, Any]
 
 
-class ChatRequest(BaseModel):
-    message: str
+class ChatSessionRequest(BaseModel):
     portfolio: List[Dict[str, Any]] = []
-    selectedStock: Optional[str] = None
-    conversationHistory: List[Dict[str, str]] = []
     mlPredictions: Optional[Dict[str, Any]] = None
     portfolioNews: Dict[str, List[Dict[str, Any]]] = {}
     marketNews: List[Dict[str, Any]] = []
 
 
+class ChatRequest(ChatSessionRequest):
+    message: str
+    selectedStock: Optional[str] = None
+    conversationHistory: List[Dict[str, str]] = []
+    # From POST /chat/session; its payloads fill in any the request leaves empty
+    sessionId: Optional[str] = None
+
+
 class RecommendationsRequest(BaseModel):
     portfolio: List[Dict[str, Any]]
     metrics: Optional[Dict[str, Any]] = None
@@ -147,35 +490,53 @@ async def health_check():
 
 
 @app.post("/historical")
-async def get_historical_data(request: HistoricalRequest):
+async def get_historical_data(request: HistoricalRequest, http_request: Request):
     """
     Fetch historical OHLCV data for a symbol
 
-    Returns cached data if available, otherwise fetches from Yahoo Finance
+    Returns cached data if available, otherwise fetches from Yahoo Finance.
+    With format="columnar", data is one array per column instead of one object per row.
+    Clients sending `Accept: application/vnd.apache.arrow.stream` get the bars
+    as an Arrow IPC stream instead of JSON.
     """
-    symbol = request.symbol.upper()
-    cache_key = f"historical:{symbol}:{request.days}"
+    symbol = request.symbol
 
-    try:
-        # Check cache first
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
+    if ARROW_STREAM in http_request.headers.get('accept', ''):
+        arrow_key = f"historical:{symbol}:{request.days}:arrow"
+        raw = cache.get(arrow_key)
+        if raw is None:
+            try:
+                df = await _fetch_history(symbol, request.days)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to fetch historical data: {str(e)}")
+            raw = _arrow_ipc(df)
+            cache.set(arrow_key, raw, ttl=300)
+        return Response(content=raw, media_type=ARROW_STREAM)
+
+    cache_key = f"historical:{symbol}:{request.days}:{request.format}"
 
-        # Fetch fresh data
-        df = stock_fetcher.fetch_historical_data(symbol, days=request.days)
+    async def build() -> Dict:
+        df = await _fetch_history(symbol, request.days)
+
+        dates = df['date'].dt.strftime('%Y-%m-%d')
+        if request.format == 'columnar':
+            # numpy columns are encoded by orjson directly, no per-row objects
+            data = {'date': dates.tolist(), **{c: df[c].to_numpy() for c in df.columns if c != 'date'}}
+        else:
+            data = df.assign(date=dates).to_dict('records')
 
-        response = {
+        return {
             "symbol": symbol,
-            "data": df.to_dict('records'),
+            "data": data,
             "dataPoints": len(df),
             "timestamp": datetime.now().isoformat()
         }
 
+    try:
         # Cache for 5 minutes
-        cache.set(cache_key, response, ttl=300)
-
-        return response
+        return _json_response(await _cached_json(cache_key, build, ttl=300))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -190,22 +551,15 @@ async def get_quote(request: QuoteRequest):
 
     Returns real-time price, change, volume, and key metrics
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     cache_key = f"quote:{symbol}"
 
-    try:
-        # Check cache (1 minute TTL for quotes)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
-
-        # Fetch fresh quote
-        quote_data = stock_fetcher.fetch_quote(symbol)
+    async def build() -> Dict:
+        return await asyncio.to_thread(stock_fetcher.fetch_quote, symbol)
 
+    try:
         # Cache for 1 minute
-        cache.set(cache_key, quote_data, ttl=60)
-
-        return quote_data
+        return _json_response(await _cached_json(cache_key, build, ttl=60))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -220,22 +574,15 @@ async def get_fundamentals(request: FundamentalsRequest):
 
     Returns different metrics based on whether symbol is stock or ETF
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     cache_key = f"fundamentals:{symbol}"
 
-    try:
-        # Check cache (1 hour TTL for fundamentals)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
-
-        # Fetch fresh fundamentals
-        fundamentals_data = stock_fetcher.fetch_fundamentals(symbol)
+    async def build() -> Dict:
+        return await asyncio.to_thread(stock_fetcher.fetch_fundamentals, symbol)
 
+    try:
         # Cache for 1 hour
-        cache.set(cache_key, fundamentals_data, ttl=3600)
-
-        return fundamentals_data
+        return _json_response(await _cached_json(cache_key, build, ttl=3600))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -251,88 +598,85 @@ async def calculate_indicators(request: IndicatorsRequest):
     Returns comprehensive technical analysis including RSI, MACD, Bollinger Bands,
     Moving Averages, Stochastic, VWAP, ADX, Williams %R, CCI, and overall signal
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     cache_key = f"indicators:{symbol}:{request.days}"
 
-    try:
-        # Check cache (5 minute TTL)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
-
-        print(f"\n[Indicators] Calculating for {symbol} ({request.days} days)")
+    async def build() -> Dict:
+        logger.info("[Indicators] Calculating for %s (%d days)", symbol, request.days)
 
         # Fetch historical data
-        df = stock_fetcher.fetch_historical_data(symbol, days=request.days)
+        df = await _fetch_history(symbol, request.days)
+
+        # Calculate all technical indicators (off the event loop)
+        analysis = await asyncio.to_thread(TechnicalIndicators.calculate_all, df)
 
-        # Calculate all technical indicators
-        analysis = TechnicalIndicators.calculate_all(df)
+        logger.info("[Indicators] Complete for %s - Overall: %s", symbol, analysis['overallSignal'])
 
-        response = {
+        return {
             "symbol": symbol,
             "analysis": analysis,
             "dataPoints": len(df),
-            "currentPrice": float(df['close'].iloc[-1])
+            "currentPrice": _last_close(df)
         }
 
+    try:
         # Cache for 5 minutes
-        cache.set(cache_key, response, ttl=300)
-
-        print(f"[Indicators] Complete for {symbol} - Overall: {analysis['overallSignal']}")
-
-        return response
+        return _json_response(await _cached_json(cache_key, build, ttl=300))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("[Indicators] Failed for %s", symbol)
         raise HTTPException(status_code=500, detail=f"Failed to calculate indicators: {str(e)}")
 
 
 @app.post("/indicators/timeseries")
-async def calculate_indicators_timeseries(request: IndicatorsRequest):
+async def calculate_indicators_timeseries(request: IndicatorsRequest, http_request: Request):
     """
     Calculate technical indicators for every data point (for charting)
 
     Returns time series data with MACD, RSI, Bollinger Bands, Stochastic for each date.
-    Used for rendering charts in the frontend.
+    Used for rendering charts in the frontend. Clients sending
+    `Accept: application/x-ndjson` get the points streamed one JSON object per line.
     """
-    symbol = request.symbol.upper()
-    cache_key = f"indicators_timeseries:{symbol}:{request.days}"
+    symbol = request.symbol
 
-    try:
-        # Check cache (5 minute TTL)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
+    if NDJSON in http_request.headers.get('accept', ''):
+        try:
+            df = await _fetch_history(symbol, request.days)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to calculate timeseries indicators: {str(e)}")
+        return StreamingResponse(_ndjson(TechnicalIndicators.iter_timeseries(df)), media_type=NDJSON)
 
-        print(f"\n[Indicators Timeseries] Calculating for {symbol} ({request.days} days)")
+    cache_key = f"indicators_timeseries:{symbol}:{request.days}"
+
+    async def build() -> Dict:
+        logger.info("[Indicators Timeseries] Calculating for %s (%d days)", symbol, request.days)
 
         # Fetch historical data
-        df = stock_fetcher.fetch_historical_data(symbol, days=request.days)
+        df = await _fetch_history(symbol, request.days)
+
+        # Calculate timeseries indicators (off the event loop)
+        timeseries_data = await asyncio.to_thread(TechnicalIndicators.calculate_timeseries, df)
 
-        # Calculate timeseries indicators
-        timeseries_data = TechnicalIndicators.calculate_timeseries(df)
+        logger.info("[Indicators Timeseries] Complete for %s - %d points", symbol, len(timeseries_data))
 
-        response = {
+        return {
             "symbol": symbol,
             "data": timeseries_data,
             "dataPoints": len(timeseries_data)
         }
 
+    try:
         # Cache for 5 minutes
-        cache.set(cache_key, response, ttl=300)
-
-        print(f"[Indicators Timeseries] Complete for {symbol} - {len(timeseries_data)} points")
-
-        return response
+        return _json_response(await _cached_json(cache_key, build, ttl=300))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("[Indicators Timeseries] Failed for %s", symbol)
         raise HTTPException(status_code=500, detail=f"Failed to calculate timeseries indicators: {str(e)}")
 
 
@@ -343,47 +687,43 @@ async def get_engineered_features(request: FeaturesRequest):
 
     Useful for custom analysis and understanding feature importance
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     cache_key = f"features:{symbol}:{request.days}"
 
-    try:
-        # Check cache (5 minute TTL)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
+    async def build() -> Dict:
+        logger.info("[Features] Extracting for %s", symbol)
 
-        print(f"\n[Features] Extracting for {symbol}")
-
-        # Fetch historical data
-        df = stock_fetcher.fetch_historical_data(symbol, days=request.days)
-
-        # Fetch SPY data for market-relative features (unless symbol IS SPY)
-        spy_df = None
-        if symbol != 'SPY':
-            try:
-                spy_df = stock_fetcher.fetch_historical_data('SPY', days=request.days)
-                print(f"   ✓ Fetched SPY data for beta calculation")
-            except:
-                print(f"   ⚠ Could not fetch SPY data")
+        # Fetch historical data, with SPY for market-relative features (unless symbol IS SPY)
+        df, spy_df = await _fetch_with_spy(symbol, request.days)
 
         # Extract current features
-        current_features = extract_features(df, -1, spy_df=spy_df)
+        current_features = await asyncio.to_thread(extract_features, df, -1, spy_df)
 
-        # Also get historical features for last 30 days
+        # Also get historical features for last 30 days (oldest to newest) in one
+        # batch over the trailing window; look_forward=0 keeps the final row
         historical_features = []
-        lookback = min(30, len(df) - 200)  # Last 30 days or available
-        for i in range(lookback):
-            idx = -(i + 1)
-            try:
-                feat = extract_features(df, idx, spy_df=spy_df)
-                feat['date'] = df.iloc[idx]['date']
-                historical_features.append(feat)
-            except:
-                continue
-
-        historical_features.reverse()  # Oldest to newest
-
-        response = {
+        lookback = min(30, len(df) - WARMUP_BARS)  # Last 30 days or available
+        if lookback > 0:
+            window = WARMUP_BARS + lookback
+            X_hist, _, dates_hist, _ = await asyncio.to_thread(
+                engineer_dataset,
+                df.iloc[-window:].reset_index(drop=True),
+                look_forward=0,
+                spy_df=spy_df.iloc[-window:].reset_index(drop=True) if spy_df is not None else None
+            )
+            if list(X_hist.columns) != list(current_features):
+                # Batch and live extraction should emit the same columns in the
+                # same order; if they drift, align history to the live features
+                logger.warning("[Features] Historical feature columns differ from current features for %s", symbol)
+                X_hist = X_hist.reindex(columns=list(current_features))
+            historical_features = [
+                {**feat, 'date': date}
+                for feat, date in zip(X_hist.to_dict('records'), dates_hist)
+            ]
+
+        logger.info("[Features] Extracted %d features for %s", len(current_features), symbol)
+
+        return {
             "symbol": symbol,
             "current_features": current_features,
             "historical_features": historical_features,
@@ -391,23 +731,19 @@ async def get_engineered_features(request: FeaturesRequest):
             "timestamp": datetime.now().isoformat()
         }
 
+    try:
         # Cache for 5 minutes
-        cache.set(cache_key, response, ttl=300)
-
-        print(f"[Features] Extracted {len(current_features)} features for {symbol}")
-
-        return response
+        return _json_response(await _cached_json(cache_key, build, ttl=300))
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("[Features] Failed for %s", symbol)
         raise HTTPException(status_code=500, detail=f"Failed to extract features: {str(e)}")
 
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+async def predict(request: PredictionRequest, http_request: Request):
     """
     Generate ML predictions for stock/ETF
 
@@ -418,17 +754,23 @@ async def predict(request: PredictionRequest):
     4. Generates predictions for multiple timeframes
     5. Runs backtesting
     6. Returns comprehensive results
+
+    Responses are tagged per symbol and market session, so clients that send
+    If-None-Match get a 304 without recomputation.
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
+
+    etag = f'W/"{symbol}-{datetime.now(MARKET_TZ).date()}"'
+    if http_request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
 
     try:
-        print(f"\n{'='*60}")
-        print(f"[ML Service] Processing prediction request for {symbol}")
-        print(f"{'='*60}\n")
+        logger.info("[ML Service] Processing prediction request for %s", symbol)
 
-        # Fetch historical data using unified fetcher
-        print("[1/6] Fetching historical data...")
-        df = stock_fetcher.fetch_historical_data(symbol, days=730)
+        # Fetch historical data using unified fetcher (cached per symbol/window)
+        # SPY (for market-relative features, unless symbol IS SPY) comes in the same download
+        logger.info("[1/6] Fetching historical data...")
+        df, spy_df = await _fetch_with_spy(symbol, 730)
 
         if len(df) < 250:
             raise HTTPException(
@@ -436,196 +778,222 @@ async def predict(request: PredictionRequest):
                 detail=f"Insufficient data for {symbol}. Need at least 250 days, got {len(df)}"
             )
 
-        print(f"   ✓ Fetched {len(df)} data points for {symbol}")
+        logger.debug("Fetched %d data points for %s", len(df), symbol)
+        if spy_df is not None:
+            logger.debug("Fetched %d SPY data points for beta calculation", len(spy_df))
 
-        # Fetch SPY data for market-relative features (unless symbol IS SPY)
-        spy_df = None
-        if symbol != 'SPY':
-            try:
-                spy_df = stock_fetcher.fetch_historical_data('SPY', days=730)
-                print(f"   ✓ Fetched {len(spy_df)} SPY data points for beta calculation")
-            except Exception as e:
-                print(f"   ⚠ Could not fetch SPY data: {e}")
-                spy_df = None
-
-        # Engineer features
-        print("[2/6] Engineering features...")
-        X, y_returns, dates, prices = engineer_dataset(df, look_forward=1, spy_df=spy_df)
-        print(f"   ✓ Engineered {X.shape[1]} features from {len(X)} samples")
-        print(f"   ✓ Target: Predicting returns (not absolute prices)")
-
-        # Normalize features
-        X_normalized, means, stds = normalize_features(X)
-
-        # Train/test split (80/20)
-        split_idx = int(len(X) * 0.8)
-        X_train = X_normalized.iloc[:split_idx]
-        y_train = y_returns.iloc[:split_idx]  # Training on returns
-        X_test = X_normalized.iloc[split_idx:]
-        y_test = y_returns.iloc[split_idx:]  # Testing on returns
-        test_prices = prices.iloc[split_idx:]  # Need prices to convert returns back
-        test_dates = dates[split_idx:]
-
-        # Train ML Ensemble (on returns)
-        print("[3/6] Training ML models on returns...")
-        ml_ensemble = MLEnsemble()
-        train_metrics = ml_ensemble.train(X_train, y_train)
-        print(f"   ✓ Models trained - R²: {train_metrics['r2']:.3f}")
-
-        # Train Time Series Models
-        print("[4/6] Training time series models...")
-        ts_models = TimeSeriesModels()
-        ts_models.train(df['close'])
-        print(f"   ✓ Time series models trained")
-
-        # Evaluate on test set
-        print("[5/6] Evaluating models...")
-        test_return_predictions = ml_ensemble.predict(X_test)
-        test_performance = evaluate_model(y_test.values, test_return_predictions)
-        confidence_scores = ml_ensemble.calculate_confidence(X_test)
-        print(f"   ✓ Test MAE: {test_performance['mae']:.4f} (return), Accuracy: {test_performance['directional_accuracy']:.1f}%")
-
-        # Get current features for prediction
-        current_features = extract_features(df, -1, spy_df=spy_df)
-        current_features_df = pd.DataFrame([current_features])
-
-        # Normalize using training set statistics (not single row statistics!)
-        current_features_normalized = pd.DataFrame()
-        for col in current_features_df.columns:
-            if col in means and col in stds:
-                current_features_normalized[col] = (current_features_df[col] - means[col]) / stds[col]
+        async def build() -> Dict:
+            # Plain float array for positional close price lookups
+            close_np = df['close'].to_numpy(dtype=np.float64, copy=False)
+
+            # Reuse trained models, statistics and backtest while the price data is unchanged
+            model_key = ModelCache.make_key(
+                symbol, close_np, spy_df['close'].to_numpy() if spy_df is not None else None
+            )
+            cached_models = model_cache.get(model_key)
+
+            if cached_models is None:
+                # Engineer, normalize and split in a worker process; the row loop
+                # is pure Python and would otherwise hold the GIL for the event loop
+                logger.info("[2/6] Engineering features...")
+                prepared = await asyncio.wrap_future(_pool.submit(prepare_training_data, df, spy_df))
+                current_features = prepared['current_features']
+                X_train, y_train = prepared['X_train'], prepared['y_train']
+                X_test, y_test = prepared['X_test'], prepared['y_test']
+                test_dates = prepared['test_dates']
+                feature_names = prepared['feature_names']
+                means_vec, stds_vec = prepared['means'], prepared['stds']
+                logger.debug(
+                    "Engineered %d features from %d samples (target: returns)",
+                    len(feature_names), len(X_train) + len(X_test)
+                )
+
+                # Train ML Ensemble (on returns) and Time Series Models in parallel
+                logger.info("[3/6] Training ML models on returns...")
+                logger.info("[4/6] Training time series models...")
+                fut_ml = _pool.submit(train_ml_ensemble, X_train, y_train)
+                fut_ts = _pool.submit(train_time_series, df['close'])
+
+                ml_ensemble, train_metrics = await asyncio.wrap_future(fut_ml)
+                logger.debug("Models trained - R²: %.3f", train_metrics['r2'])
+
+                # One pass over the test set feeds both evaluation and the backtest
+                # (off the event loop: four models over the whole test set)
+                test_predictions = await asyncio.to_thread(ml_ensemble.predict_with_confidence, X_test)
+
+                # Start the backtest as soon as the ensemble is ready
+                backtester = Backtester(initial_capital=10000)
+
+                # Backtester needs actual closing prices for the test period (+1 for next day's price)
+                actual_test_prices = prepared['test_prices']
+
+                # Predictions are passed in, so the backtest is just the numba
+                # simulation: run it on a thread rather than pickling the
+                # ensemble over to a worker process
+                backtest_task = asyncio.ensure_future(asyncio.to_thread(
+                    backtester.run_backtest, ml_ensemble, X_test, actual_test_prices, test_dates, test_predictions
+                ))
+
+                # Evaluate on test set
+                logger.info("[5/6] Evaluating models...")
+                test_performance = evaluate_model(y_test.values, test_predictions[0])
             else:
-                current_features_normalized[col] = 0
+                logger.info("[2/6]-[5/6] Using cached models for unchanged data")
+                ml_ensemble = cached_models['ml_ensemble']
+                ts_models = cached_models['ts_models']
+                feature_names = cached_models['feature_names']
+                means_vec = cached_models['means']
+                stds_vec = cached_models['stds']
+                test_performance = cached_models['test_performance']
+
+                # Get current features for prediction
+                current_features = await asyncio.to_thread(extract_features, df, -1, spy_df)
+
+            logger.debug(
+                "Test MAE: %.4f (return), Accuracy: %.1f%%",
+                test_performance['mae'], test_performance['directional_accuracy']
+            )
 
-        # Final safety check for NaN/inf
-        current_features_normalized = current_features_normalized.replace([np.inf, -np.inf], 0)
-        current_features_normalized = current_features_normalized.fillna(0)
 
-        # Generate predictions
-        # Get real-time current price using fast_info (most reliable real-time price)
-        try:
-            ticker = yf.Ticker(symbol)
-            # Use fast_info for quick real-time price access
-            current_price = float(ticker.fast_info.get('lastPrice', df.iloc[-1]['close']))
-            print(f"   ✓ Real-time price: ${current_price:.2f} (from fast_info)")
-        except Exception as e:
-            # Fallback to info if fast_info fails
-            try:
-                info = ticker.info
-                current_price = float(info.get('currentPrice') or info.get('regularMarketPrice') or df.iloc[-1]['close'])
-                print(f"   ✓ Real-time price: ${current_price:.2f} (from info)")
-            except Exception as e2:
-                print(f"   ⚠ Could not fetch real-time price, using last close: {e2}")
-                current_price = float(df.iloc[-1]['close'])
-
-        # Next day prediction (ML models predict RETURN, convert to price)
-        next_day_return = float(ml_ensemble.predict(current_features_normalized)[0])
-        next_day_pred_price = current_price * (1 + next_day_return)  # Convert return to price
-        next_day_conf = float(ml_ensemble.calculate_confidence(current_features_normalized)[0])
-
-        # Multi-step predictions (Time Series models - these still predict prices)
-        next_week_ts = ts_models.predict(steps=5)
-        next_month_ts = ts_models.predict(steps=20)
-
-        # Calculate confidence intervals (based on return std, converted to price)
-        next_day_return_std = test_performance['rmse']  # This is now std of returns
-        next_day_lower = current_price * (1 + next_day_return - 2 * next_day_return_std)
-        next_day_upper = current_price * (1 + next_day_return + 2 * next_day_return_std)
-
-        # Week/month intervals (wider due to time)
-        week_return = (next_week_ts['ensemble'] - current_price) / current_price
-        month_return = (next_month_ts['ensemble'] - current_price) / current_price
-
-        predictions = {
-            'nextDay': {
-                'predictedPrice': round(next_day_pred_price, 2),
-                'predictedReturn': round(next_day_return * 100, 2),  # Return in %
-                'confidence': round(next_day_conf, 2),
-                'lowerBound': round(next_day_lower, 2),
-                'upperBound': round(next_day_upper, 2),
-                'modelName': 'ML Ensemble'
-            },
-            'nextWeek': {
-                'predictedPrice': round(next_week_ts['ensemble'], 2),
-                'predictedReturn': round(week_return * 100, 2),
-                'confidence': round(next_week_ts['confidence'], 2),
-                'lowerBound': round(current_price * (1 + week_return - 2 * next_day_return_std * 1.5), 2),
-                'upperBound': round(current_price * (1 + week_return + 2 * next_day_return_std * 1.5), 2),
-                'modelName': 'Time Series Ensemble'
-            },
-            'nextMonth': {
-                'predictedPrice': round(next_month_ts['ensemble'], 2),
-                'predictedReturn': round(month_return * 100, 2),
-                'confidence': round(next_month_ts['confidence'], 2),
-                'lowerBound': round(current_price * (1 + month_return - 2 * next_day_return_std * 2), 2),
-                'upperBound': round(current_price * (1 + month_return + 2 * next_day_return_std * 2), 2),
-                'modelName': 'Time Series Ensemble'
+            # Normalize using training set statistics (not single row statistics!)
+            x = np.array([[current_features.get(name, 0.0) for name in feature_names]], dtype=np.float64)
+            x = (x - means_vec) / stds_vec
+
+            # Final safety check for NaN/inf
+            np.nan_to_num(x, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+            current_features_normalized = x.astype(np.float32)
+
+            # Generate predictions
+            # Get real-time current price (cached briefly), falling back to last close
+            live_price = await _get_live_price(symbol)
+            current_price = live_price if live_price is not None else float(close_np[-1])
+
+            # Next day prediction (ML models predict RETURN, convert to price)
+            next_day_preds, next_day_confs = await asyncio.to_thread(
+                ml_ensemble.predict_with_confidence, current_features_normalized
+            )
+            next_day_return = float(next_day_preds[0])
+            next_day_pred_price = current_price * (1 + next_day_return)  # Convert return to price
+            next_day_conf = float(next_day_confs[0])
+
+            # Multi-step predictions (Time Series models - these still predict prices)
+            if cached_models is None:
+                ts_models = await asyncio.wrap_future(fut_ts)
+                logger.debug("Time series models trained")
+            ts_preds = ts_models.predict_multi([5, 20])
+            next_week_ts = ts_preds[5]
+            next_month_ts = ts_preds[20]
+
+            week_return = (next_week_ts['ensemble'] - current_price) / current_price
+            month_return = (next_month_ts['ensemble'] - current_price) / current_price
+
+            # Calculate confidence intervals (based on return std, converted to price)
+            # for next day/week/month: ±2σ in log space with σ scaled by √horizon,
+            # so intervals widen with time and compounding keeps lower bounds positive
+            next_day_return_std = test_performance['rmse']  # This is now std of returns
+            horizons = np.array([1, 5, 20])
+            sigma_h = next_day_return_std * np.sqrt(horizons)
+            mu_h = np.log1p([next_day_return, week_return, month_return])
+            lower_bounds = np.round(current_price * np.exp(mu_h - 2 * sigma_h), 2).tolist()
+            upper_bounds = np.round(current_price * np.exp(mu_h + 2 * sigma_h), 2).tolist()
+
+            predictions = {
+                'nextDay': {
+                    'predictedPrice': round(next_day_pred_price, 2),
+                    'predictedReturn': round(next_day_return * 100, 2),  # Return in %
+                    'confidence': round(next_day_conf, 2),
+                    'lowerBound': lower_bounds[0],
+                    'upperBound': upper_bounds[0],
+                    'modelName': 'ML Ensemble'
+                },
+                'nextWeek': {
+                    'predictedPrice': round(next_week_ts['ensemble'], 2),
+                    'predictedReturn': round(week_return * 100, 2),
+                    'confidence': round(next_week_ts['confidence'], 2),
+                    'lowerBound': lower_bounds[1],
+                    'upperBound': upper_bounds[1],
+                    'modelName': 'Time Series Ensemble'
+                },
+                'nextMonth': {
+                    'predictedPrice': round(next_month_ts['ensemble'], 2),
+                    'predictedReturn': round(month_return * 100, 2),
+                    'confidence': round(next_month_ts['confidence'], 2),
+                    'lowerBound': lower_bounds[2],
+                    'upperBound': upper_bounds[2],
+                    'modelName': 'Time Series Ensemble'
+                }
             }
-        }
 
-        # Feature importance
-        importance = ml_ensemble.get_feature_importance()
-        feature_importance = [
-            {'feature': name, 'importance': imp}
-            for name, imp in list(importance.items())[:10]
-        ]
+            # Feature importance
+            importance = ml_ensemble.get_feature_importance()
+            feature_importance = [
+                {'feature': name, 'importance': imp}
+                for name, imp in islice(importance.items(), 10)
+            ]
+
+            if cached_models is None:
+                logger.info("[6/6] Running backtest...")
+                backtest_result = await backtest_task
+                model_cache.set(model_key, {
+                    'ml_ensemble': ml_ensemble,
+                    'ts_models': ts_models,
+                    'feature_names': feature_names,
+                    'means': means_vec,
+                    'stds': stds_vec,
+                    'test_performance': test_performance,
+                    'backtest_result': backtest_result
+                })
+            else:
+                logger.info("[6/6] Using cached backtest")
+                backtest_result = cached_models['backtest_result']
+            logger.debug("Backtest complete - Return: %.2f%%", backtest_result['total_return'])
 
-        # Run backtest
-        print("[6/6] Running backtest...")
-        backtester = Backtester(initial_capital=10000)
-
-        # Backtester needs actual price series for the test period
-        # Get the actual closing prices for the test period from original data
-        test_start_idx = 200 + split_idx  # Original data starts at 200, plus train size
-        test_end_idx = test_start_idx + len(X_test) + 1  # +1 for next day's price
-        actual_test_prices = df['close'].iloc[test_start_idx:test_end_idx].reset_index(drop=True)
-
-        backtest_result = backtester.run_backtest(ml_ensemble, X_test, actual_test_prices, test_dates)
-        print(f"   ✓ Backtest complete - Return: {backtest_result['total_return']:.2f}%")
-
-        # Generate recommendation (use the predicted return)
-        recommendation = generate_recommendation(next_day_return, next_day_conf)
-
-        # Generate analysis
-        analysis = generate_analysis(predictions, test_performance, current_price)
-
-        # Overall confidence
-        overall_confidence = round((next_day_conf + test_performance['r2']) / 2, 2)
-
-        print(f"\n{'='*60}")
-        print(f"[ML Service] Prediction complete for {symbol}")
-        print(f"Recommendation: {recommendation}")
-        print(f"Next Day: ${next_day_pred_price:.2f} ({next_day_return*100:+.2f}%)")
-        print(f"{'='*60}\n")
-
-        return PredictionResponse(
-            symbol=symbol,
-            current_price=round(current_price, 2),
-            predictions=predictions,
-            model_performances={
-                'ensemble': test_performance
-            },
-            feature_importance=feature_importance,
-            confidence=overall_confidence,
-            recommendation=recommendation,
-            analysis=analysis,
-            backtest={
-                'totalReturns': round(backtest_result['total_return'], 2),
-                'annualizedReturns': round(backtest_result['metrics']['annualized_return'], 2),
-                'sharpeRatio': round(backtest_result['metrics']['sharpe_ratio'], 2),
-                'maxDrawdown': round(backtest_result['metrics']['max_drawdown'], 2),
-                'winRate': round(backtest_result['metrics']['win_rate'], 1),
-                'profitFactor': round(backtest_result['metrics']['profit_factor'], 2),
-                'trades': backtest_result['trades'][:50]  # Limit trade history
-            },
-            data_points=len(df),
-            last_update=datetime.now().isoformat()
-        )
+            # Generate recommendation (use the predicted return)
+            recommendation = generate_recommendation(next_day_return, next_day_conf)
+
+            # Generate analysis
+            analysis = generate_analysis(predictions, test_performance)
+
+            # Overall confidence
+            overall_confidence = round((next_day_conf + test_performance['r2']) / 2, 2)
+
+            logger.info(
+                "[ML Service] Prediction complete for %s - Recommendation: %s, Next Day: $%.2f (%+.2f%%)",
+                symbol, recommendation, next_day_pred_price, next_day_return * 100
+            )
+
+            return PredictionResponse(
+                symbol=symbol,
+                current_price=round(current_price, 2),
+                predictions=predictions,
+                model_performances={
+                    'ensemble': test_performance
+                },
+                feature_importance=feature_importance,
+                confidence=overall_confidence,
+                recommendation=recommendation,
+                analysis=analysis,
+                backtest={
+                    'totalReturns': round(backtest_result['total_return'], 2),
+                    'annualizedReturns': round(backtest_result['metrics']['annualized_return'], 2),
+                    'sharpeRatio': round(backtest_result['metrics']['sharpe_ratio'], 2),
+                    'maxDrawdown': round(backtest_result['metrics']['max_drawdown'], 2),
+                    'winRate': round(backtest_result['metrics']['win_rate'], 1),
+                    'profitFactor': round(backtest_result['metrics']['profit_factor'], 2),
+                    'trades': backtest_result['trades'].head(50).to_dict('records')  # Limit trade history
+                },
+                data_points=len(df),
+                last_update=datetime.now().isoformat()
+            ).model_dump()
+
+        # Repeat requests against the same latest bar share one result (and
+        # one computation) for a minute
+        cache_key = f"predict:{symbol}:{df['date'].iloc[-1].date()}"
+        raw = await _cached_json(cache_key, build, ttl=60)
+        return _json_response(raw, headers={'ETag': etag, 'Cache-Control': 'private, max-age=3600'})
 
     except Exception as e:
-        print(f"[ML Service] Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ML Service] Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -636,33 +1004,30 @@ async def get_news(request: NewsRequest):
 
     Returns recent news articles from the last 7 days
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     cache_key = f"news:{symbol}"
 
-    try:
-        # Check cache (10 minute TTL for news)
-        cached_data = cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
-
-        # Get API key from environment
-        api_key = os.getenv('FINNHUB_API_KEY')
+    # Get API key from environment
+    api_key = os.getenv('FINNHUB_API_KEY')
 
-        if not api_key:
-            print("⚠ FINNHUB_API_KEY not configured, returning demo data")
-            # Return demo data if no API key
-            demo_news = get_demo_news(symbol)
-            return {"news": demo_news}
+    if not api_key:
+        logger.warning("FINNHUB_API_KEY not configured, returning demo data")
+        # Return demo data if no API key
+        demo_news = get_demo_news(symbol)
+        return {"news": demo_news}
 
+    async def build() -> Dict:
         # Calculate date range (last 7 days)
-        today = datetime.now().strftime('%Y-%m-%d')
-        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        week_ago = (now - timedelta(days=7)).strftime('%Y-%m-%d')
 
-        # Fetch news from Finnhub
+        # Fetch news from Finnhub (bounded so a portfolio view can't burst past the rate limit)
         url = f"https://finnhub.io/api/v1/company-news?symbol={symbol}&from={week_ago}&to={today}&token={api_key}"
-        response = requests.get(url, timeout=10)
+        async with app.state.finnhub_slots:
+            response = await app.state.http.get(url, timeout=10)
 
-        if not response.ok:
+        if not response.is_success:
             raise HTTPException(status_code=500, detail="Failed to fetch news from Finnhub")
 
         data = response.json()
@@ -680,15 +1045,14 @@ async def get_news(request: NewsRequest):
                 "image": item.get("image", "")
             })
 
-        result = {"news": news}
-
-        # Cache for 10 minutes
-        cache.set(cache_key, result, ttl=600)
+        return {"news": news}
 
-        return result
+    try:
+        # Cache for 10 minutes; concurrent requests for a symbol share one Finnhub call
+        return _json_response(await _cached_json(cache_key, build, ttl=600))
 
     except Exception as e:
-        print(f"News API error: {e}")
+        logger.error("News API error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch news: {str(e)}")
 
 
@@ -710,16 +1074,16 @@ async def search_stocks(request: SearchRequest):
         # Check cache (1 hour TTL for search results)
         cached_data = cache.get(cache_key)
         if cached_data is not None:
-            return cached_data
+            return _json_response(cached_data)
 
-        print(f"[Search] Searching for: {query}")
+        logger.info("[Search] Searching for: %s", query)
 
         # Use yfinance Ticker search through Yahoo Finance web API
         # Note: yfinance doesn't have a direct search API, so we'll use a workaround
         # Try to get ticker info directly if it looks like a symbol
         if len(query) <= 5 and query.isupper():
             try:
-                ticker = yf.Ticker(query)
+                ticker = stock_fetcher.get_ticker(query)
                 info = ticker.info
 
                 results = [{
@@ -729,45 +1093,66 @@ async def search_stocks(request: SearchRequest):
                     "exchange": info.get('exchange', '')
                 }]
 
-                result = {"results": results}
-                cache.set(cache_key, result, ttl=3600)
-                return result
+                raw = _cache_json(cache_key, {"results": results}, ttl=3600)
+                return _json_response(raw)
             except:
                 pass
 
-        # For company name searches, use a simple mapping of popular stocks
+        # For company name searches, use the index over popular stocks
         # In production, you'd want to use a proper search API or database
-        popular_stocks = get_popular_stocks_mapping()
-
-        results = []
-        query_lower = query.lower()
-
-        # Search through popular stocks
-        for symbol, data in popular_stocks.items():
-            if (query_lower in symbol.lower() or
-                query_lower in data['name'].lower()):
-                results.append({
-                    "symbol": symbol,
-                    "name": data['name'],
-                    "type": data['type'],
-                    "exchange": data['exchange']
-                })
-
-        # Limit to top 10 results
-        results = results[:10]
-
-        result = {"results": results}
+        results = stock_search_index.search(query, limit=10)
 
         # Cache for 1 hour
-        cache.set(cache_key, result, ttl=3600)
+        raw = _cache_json(cache_key, {"results": results}, ttl=3600)
 
-        return result
+        return _json_response(raw)
 
     except Exception as e:
-        print(f"Search error: {e}")
+        logger.error("Search error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to search stocks: {str(e)}")
 
 
+# Static part of each signal /indicators/signals can emit, keyed by (indicator, condition)
+SIGNAL_TABLE: Dict[Tuple[str, str], Dict[str, Any]] = {
+    ('rsi', 'oversold'): {
+        "type": "bullish",
+        "indicator": "RSI Oversold",
+        "signal": "RSI at {rsi:.2f} - Potential oversold condition, watch for reversal",
+        "confidence": 0.75,
+    },
+    ('rsi', 'overbought'): {
+        "type": "bearish",
+        "indicator": "RSI Overbought",
+        "signal": "RSI at {rsi:.2f} - Potential overbought condition",
+        "confidence": 0.75,
+    },
+    ('macd', 'bullish'): {
+        "type": "bullish",
+        "indicator": "MACD Crossover",
+        "signal": "Bullish MACD crossover detected - Uptrend strengthening",
+        "confidence": 0.82,
+    },
+    ('macd', 'bearish'): {
+        "type": "bearish",
+        "indicator": "MACD Crossover",
+        "signal": "Bearish MACD crossover - Downtrend detected",
+        "confidence": 0.82,
+    },
+    ('bollinger', 'above'): {
+        "type": "warning",
+        "indicator": "Bollinger Band",
+        "signal": "Price above upper band - High volatility, potential pullback",
+        "confidence": 0.68,
+    },
+    ('bollinger', 'below'): {
+        "type": "bullish",
+        "indicator": "Bollinger Band",
+        "signal": "Price below lower band - Volatility extreme, potential bounce",
+        "confidence": 0.72,
+    },
+}
+
+
 @app.post("/indicators/signals")
 async def generate_signals(request: SignalsRequest):
     """
@@ -775,31 +1160,26 @@ async def generate_signals(request: SignalsRequest):
 
     Analyzes RSI, MACD, Bollinger Bands to produce actionable signals
     """
-    symbol = request.symbol.upper()
+    symbol = request.symbol
     data = request.data
 
     try:
         signals = []
+        now_iso = datetime.now().isoformat()
+
+        def emit(key: Tuple[str, str], **fields):
+            signal = dict(SIGNAL_TABLE[key], timestamp=now_iso)
+            if fields:
+                signal['signal'] = signal['signal'].format(**fields)
+            signals.append(signal)
 
         # RSI signals
         if 'rsi' in data and data['rsi'] is not None:
             rsi = float(data['rsi'])
             if rsi < 30:
-                signals.append({
-                    "type": "bullish",
-                    "indicator": "RSI Oversold",
-                    "signal": f"RSI at {rsi:.2f} - Potential oversold condition, watch for reversal",
-                    "confidence": 0.75,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('rsi', 'oversold'), rsi=rsi)
             elif rsi > 70:
-                signals.append({
-                    "type": "bearish",
-                    "indicator": "RSI Overbought",
-                    "signal": f"RSI at {rsi:.2f} - Potential overbought condition",
-                    "confidence": 0.75,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('rsi', 'overbought'), rsi=rsi)
 
         # MACD signals
         if all(k in data for k in ['macd', 'signal', 'histogram']):
@@ -808,21 +1188,9 @@ async def generate_signals(request: SignalsRequest):
             histogram = float(data['histogram'])
 
             if histogram > 0 and macd > signal:
-                signals.append({
-                    "type": "bullish",
-                    "indicator": "MACD Crossover",
-                    "signal": "Bullish MACD crossover detected - Uptrend strengthening",
-                    "confidence": 0.82,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('macd', 'bullish'))
             elif histogram < 0 and macd < signal:
-                signals.append({
-                    "type": "bearish",
-                    "indicator": "MACD Crossover",
-                    "signal": "Bearish MACD crossover - Downtrend detected",
-                    "confidence": 0.82,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('macd', 'bearish'))
 
         # Bollinger Bands signals
         if all(k in data for k in ['price', 'bollinger_upper', 'bollinger_lower']):
@@ -831,105 +1199,320 @@ async def generate_signals(request: SignalsRequest):
             bb_lower = float(data['bollinger_lower'])
 
             if price > bb_upper:
-                signals.append({
-                    "type": "warning",
-                    "indicator": "Bollinger Band",
-                    "signal": "Price above upper band - High volatility, potential pullback",
-                    "confidence": 0.68,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('bollinger', 'above'))
             elif price < bb_lower:
-                signals.append({
-                    "type": "bullish",
-                    "indicator": "Bollinger Band",
-                    "signal": "Price below lower band - Volatility extreme, potential bounce",
-                    "confidence": 0.72,
-                    "timestamp": datetime.now().isoformat()
-                })
+                emit(('bollinger', 'below'))
 
         return {"signals": signals}
 
     except Exception as e:
-        print(f"Signal generation error: {e}")
+        logger.error("Signal generation error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate signals: {str(e)}")
 
 
+# Static instructions for /ai/chat. Sent first and never formatted, so the
+# provider can reuse its cached prefix; request data follows in a later message.
+CHAT_SYSTEM_PROMPT = """You are an expert AI trading advisor for QuantPilot with 20+ years of experience in quantitative finance and machine learning.
+
+When responding:
+1. Keep responses SHORT and FOCUSED - answer in 120 words or fewer (200 when comparing several stocks), maximum 3-4 key points as bullet fragments, not full sentences
+2. Use clear, direct language - no excessive markdown or formatting
+3. PRIORITIZE ML predictions when available - cite EXACT predicted prices and returns
+4. Combine ML predictions with technical indicators for comprehensive analysis
+5. **IMPORTANT**: You have access to news for:
+   - The target stock being discussed
+   - ALL stocks in the user's portfolio
+   - General market news (S&P 500/SPY)
+   When news is available, reference specific headlines, their sentiment, and how they impact portfolio holdings
+6. If user asks about portfolio or market sentiment, analyze news across all holdings and market trends
+7. Give one primary recommendation based on data-driven analysis
+8. Mention 1-2 risks or considerations
+9. End with a clear actionable suggestion
+
+IMPORTANT: You can answer questions about ANY stock, not just the one currently selected. If the user asks about a specific stock symbol (e.g., AAPL, MSFT, TSLA), provide analysis for that stock even if a different stock is selected in the UI.
+
+When the user mentions several stocks and indicators for the others are listed under "Also mentioned", cover every listed symbol in this one answer: one short line per symbol, then a direct comparison.
+
+Remember:
+- When ML predictions are available, ALWAYS cite the exact predicted prices and percentage returns
+- You have access to news for PORTFOLIO stocks and MARKET trends - use this to identify broader impacts
+- If user asks "what's happening with my portfolio?" or "how's the market?", analyze all portfolio stock news and market news
+- Combine news sentiment across holdings, ML forecasts, and technical analysis for comprehensive recommendations
+- Base your analysis on REAL data provided in the context message, not generic advice
+- The ML model uses 29+ quantitative features and has been backtested
+- When discussing portfolio risk, consider news sentiment across all holdings
+- If the user asks about a stock and you don't have technical data for it, acknowledge that and provide general guidance or offer to analyze it if they want"""
+
+
+# System prompt when the user has no stock selected or mentioned, no holdings and no news
+GENERIC_SYSTEM_PROMPT = """You are an expert AI trading advisor for QuantPilot, an app for ML stock predictions, technical analysis and portfolio tracking.
+
+Answer in 80 words or fewer, in clear, direct language without heavy formatting. No stock is selected and the user has no holdings yet, so you have no market data for this question: do not invent prices or indicator values. For questions about a specific stock, ask the user to name its symbol (e.g. AAPL, SPY) so you can analyze it with real data."""
+
+
+def _sse(data: Dict, event: Optional[str] = None) -> bytes:
+    """Encode one server-sent event"""
+    frame = b'data: ' + orjson.dumps(data) + b'\n\n'
+    return b'event: ' + event.encode() + b'\n' + frame if event else frame
+
+
+def _sse_response(events: Iterator[bytes]) -> StreamingResponse:
+    """Stream server-sent events without proxy buffering"""
+    return StreamingResponse(
+        events, media_type=EVENT_STREAM, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _stream_chat(client: Groq, completion_args: Dict[str, Any], chat_key: Optional[str]) -> Iterator[bytes]:
+    """
+    Relay a streamed Groq completion as server-sent events
+
+    A plain generator: Starlette iterates it on its threadpool, so the blocking
+    Groq stream never runs on the event loop. The complete answer is cached
+    like a non-streamed one once the stream finishes.
+    """
+    parts = []
+    try:
+        for chunk in client.chat.completions.create(**completion_args, stream=True):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield _sse({"delta": delta})
+    except Exception as e:
+        logger.exception("AI Chat stream error: %s", e)
+        yield _sse({"detail": f"Failed to generate AI response: {str(e)}"}, event="error")
+        return
+
+    if chat_key is not None:
+        cache.set(chat_key, ''.join(parts), ttl=CHAT_CACHE_TTL)
+    yield _sse({}, event="done")
+
+
+CHAT_CACHE_TTL = 900
+# Completion cap for /ai/chat; the prompt asks for at most ~200 words
+CHAT_MAX_TOKENS = 384
+# Symbols from one chat message that get indicator context (target stock included)
+MAX_CHAT_SYMBOLS = 5
+_CHAT_NOISE = re.compile(r'[^a-z0-9.^=\- ]+')
+
+
+def _chat_cache_key(message: str, context_prompt: str) -> str:
+    """
+    Response cache key for a first-turn chat question
+
+    Case, punctuation and spacing are ignored, so rephrasings like "How's AAPL?"
+    and "hows AAPL" share an answer. The full context is part of the key, so
+    new prices, news or predictions never reuse a stale answer.
+    """
+    question = ' '.join(_CHAT_NOISE.sub(' ', message.lower().replace("'", '')).split())
+    digest = hashlib.blake2b(context_prompt.encode(), digest_size=16)
+    digest.update(b'\0' + question.encode())
+    return f"chat:{digest.hexdigest()}"
+
+
+# Prompt-token budget for conversation history (newest turns first)
+CHAT_HISTORY_TOKENS = 1500
+# Rough characters per token for English chat text (Llama 3 tokenizer)
+CHARS_PER_TOKEN = 4
+
+
+def _history_messages(history: List[Dict[str, str]], message: str) -> List[Dict[str, str]]:
+    """
+    Chat messages for the conversation history plus the current question
+
+    Turns are kept newest first until about CHAT_HISTORY_TOKENS tokens, so one
+    long pasted note can't crowd out the prefill budget while many short turns
+    still fit. The question is only appended if the client hasn't already put
+    it among the last few history messages.
+    """
+    kept = []
+    budget = CHAT_HISTORY_TOKENS * CHARS_PER_TOKEN
+    for msg in reversed(history):
+        content = msg.get("content", "")
+        budget -= len(content)
+        if budget < 0:
+            break
+        kept.append({
+            "role": "user" if msg.get("role") == "user" else "assistant",
+            "content": content
+        })
+    kept.reverse()
+
+    if message not in {msg.get("content") for msg in history[-3:]}:
+        kept.append({"role": "user", "content": message})
+    return kept
+
+
+# Short factual questions answered from data already at hand, without Groq
+FAST_PATH_MAX_WORDS = 8
+_FAST_PATH_OPINION = re.compile(
+    r'\b(should|why|will|would|think|compare|vs|versus|buy\w*|sell\w*|hold\w*|'
+    r'predict\w*|forecast\w*|recommend\w*|analy\w*|explain\w*)\b'
+)
+_FAST_PATH_PORTFOLIO_VALUE = re.compile(r'\b(portfolio|holdings)\b.*\b(value|worth)\b|\btotal value\b')
+_FAST_PATH_RSI = re.compile(r'\brsi\b')
+# "price" alone, not a price target/prediction or a what-price-should-I question
+_FAST_PATH_PRICE = re.compile(
+    r'(?<!target )\bprice\b(?!\s+(target|predict\w*|forecast\w*|should)\b)|\btrading at\b'
+)
+
+
+async def _try_fast_path(message: str,
+                         target_stock: Optional[str],
+                         technical_data: Optional[Dict],
+                         portfolio: List[Dict]) -> Optional[str]:
+    """
+    Answer a trivial lookup question (price, RSI, portfolio value) directly
+
+    Only short questions without opinion words ("should", "buy", "predict",
+    ...) qualify. Returns None whenever the question or the data doesn't fit,
+    leaving it to the LLM.
+    """
+    lower = message.lower()
+    if len(lower.split()) > FAST_PATH_MAX_WORDS or _FAST_PATH_OPINION.search(lower):
+        return None
+
+    if _FAST_PATH_PORTFOLIO_VALUE.search(lower):
+        if not portfolio:
+            return None
+        total_value = float(_position_values(portfolio).sum())
+        return f"Your portfolio is worth ${total_value:,.2f} across {len(portfolio)} holdings."
+
+    if not target_stock:
+        return None
+
+    if _FAST_PATH_RSI.search(lower):
+        rsi = (technical_data or {}).get('rsi') or {}
+        if rsi.get('value') is None or rsi.get('description', '').startswith('Insufficient'):
+            return None
+        return f"{target_stock} 14-day RSI: {rsi['value']:.2f} ({rsi.get('signal', 'neutral')}). {rsi['description']}."
+
+    if _FAST_PATH_PRICE.search(lower):
+        price = await _get_live_price(target_stock)
+        if price is None:
+            return None
+        return f"{target_stock} is trading at ${price:,.2f}."
+
+    return None
+
+
+@app.post("/chat/session")
+async def create_chat_session(request: ChatSessionRequest):
+    """
+    Store the heavy chat payloads (portfolio, ML predictions, news) server-side
+
+    Chat turns then send only `sessionId` and the new message. Sessions expire
+    after 15 minutes without use; create a new one whenever the payloads change.
+    """
+    session_id = await asyncio.to_thread(chat_sessions.create, request.model_dump())
+    return {"sessionId": session_id, "expiresIn": chat_sessions.ttl}
+
+
 @app.post("/ai/chat")
-async def ai_chat(request: ChatRequest):
+async def ai_chat(request: ChatRequest, http_request: Request):
     """
     AI-powered chat assistant with stock analysis and recommendations
 
-    Integrates ML predictions, technical analysis, news, and portfolio context
+    Integrates ML predictions, technical analysis, news, and portfolio context.
+    Clients sending `Accept: text/event-stream` receive the answer as it is
+    generated: `data: {"delta": ...}` events followed by an `event: done`.
     """
+    if request.sessionId:
+        session = await asyncio.to_thread(chat_sessions.get, request.sessionId)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Chat session not found or expired")
+        request = request.model_copy(update={
+            field: value for field, value in session.items() if not getattr(request, field)
+        })
+
     try:
         # Extract stock symbols from message
         mentioned_symbols = extract_stock_symbols(request.message)
 
         # Use the first mentioned symbol, or fall back to selectedStock
         target_stock = mentioned_symbols[0] if mentioned_symbols else request.selectedStock
-
-        # Fetch technical indicators for the target stock
+        # Further symbols in the same question are compared in the same answer.
+        # Only known tickers qualify, so stray upper-case words don't trigger
+        # yfinance fetches (and their retries)
+        known_symbols = {str(stock.get('symbol', '')).upper() for stock in request.portfolio}
+        known_symbols.add((request.selectedStock or '').upper())
+        compare_symbols = [
+            s for s in dict.fromkeys(mentioned_symbols)
+            if s != target_stock and (s in POPULAR_STOCKS or s in known_symbols)
+        ][:MAX_CHAT_SYMBOLS - 1]
+
+        # Technical indicators, asset type and news for the target stock
         technical_data = None
         is_etf = False
         quote_type = 'stock'
+        news_data = []
+        comparison_data: Dict[str, Dict] = {}
 
-        if target_stock:
-            # Get technical indicators
-            indicators_request = IndicatorsRequest(symbol=target_stock, days=200)
-            try:
-                indicators_response = await calculate_indicators(indicators_request)
-                technical_data = indicators_response.get('analysis')
-            except:
-                pass
+        async def fetch_indicators(symbol: str) -> Optional[Dict]:
+            indicators_request = IndicatorsRequest(symbol=symbol, days=200)
+            return _payload(await calculate_indicators(indicators_request)).get('analysis')
 
-            # Check if it's an ETF
-            try:
-                ticker = yf.Ticker(target_stock)
-                info = ticker.info
-                if info.get('quoteType') == 'ETF':
-                    is_etf = True
-                    quote_type = 'ETF'
-            except:
-                pass
-
-        # Fetch news for target stock
-        news_data = []
         if target_stock:
-            try:
-                news_request = NewsRequest(symbol=target_stock)
-                news_response = await get_news(news_request)
-                news_data = news_response.get('news', [])
-            except:
-                pass
 
-        # Build context
-        portfolio_context = generate_portfolio_context(request.portfolio)
-        technical_context = generate_technical_context(target_stock, technical_data, mentioned_symbols)
-        news_context = generate_news_context(target_stock, news_data, request.portfolioNews, request.marketNews)
-        ml_context = generate_ml_context(target_stock, request.mlPredictions)
-        asset_type_guidance = generate_asset_type_guidance(is_etf)
+            async def fetch_news() -> List[Dict]:
+                return _payload(await get_news(NewsRequest(symbol=target_stock))).get('news', [])
+
+            # Indicators (for every compared symbol too), quote type and news
+            # are independent round trips
+            indicators_result, quote_type_result, news_result, *compare_results = await asyncio.gather(
+                fetch_indicators(target_stock),
+                _get_quote_type(target_stock),
+                fetch_news(),
+                *(fetch_indicators(symbol) for symbol in compare_symbols),
+                return_exceptions=True
+            )
 
-        # Build system prompt
-        system_prompt = f"""You are an expert AI trading advisor for QuantPilot with 20+ years of experience in quantitative finance and machine learning.
+            for symbol, result in zip(compare_symbols, compare_results):
+                if isinstance(result, Exception):
+                    logger.warning("[AI Chat] Indicators unavailable for %s: %s", symbol, result)
+                elif result:
+                    comparison_data[symbol] = result
 
-When responding:
-1. Keep responses SHORT and FOCUSED - maximum 3-4 key points
-2. Use clear, direct language - no excessive markdown or formatting
-3. PRIORITIZE ML predictions when available - cite EXACT predicted prices and returns
-4. Combine ML predictions with technical indicators for comprehensive analysis
-5. **IMPORTANT**: You have access to news for:
-   - The target stock being discussed
-   - ALL stocks in the user's portfolio
-   - General market news (S&P 500/SPY)
-   When news is available, reference specific headlines, their sentiment, and how they impact portfolio holdings
-6. If user asks about portfolio or market sentiment, analyze news across all holdings and market trends
-7. Give one primary recommendation based on data-driven analysis
-8. Mention 1-2 risks or considerations
-9. End with a clear actionable suggestion
+            if isinstance(indicators_result, Exception):
+                logger.warning("[AI Chat] Indicators unavailable for %s: %s", target_stock, indicators_result)
+            else:
+                technical_data = indicators_result
 
-IMPORTANT: You can answer questions about ANY stock, not just the one currently selected. If the user asks about a specific stock symbol (e.g., AAPL, MSFT, TSLA), provide analysis for that stock even if a different stock is selected in the UI.
+            # Check if it's an ETF
+            if isinstance(quote_type_result, Exception):
+                logger.warning("[AI Chat] Quote type unavailable for %s: %s", target_stock, quote_type_result)
+            elif quote_type_result == 'ETF':
+                is_etf = True
+                quote_type = 'ETF'
+
+            if isinstance(news_result, Exception):
+                logger.warning("[AI Chat] News unavailable for %s: %s", target_stock, news_result)
+            else:
+                news_data = news_result
 
-{asset_type_guidance}
+        stream = EVENT_STREAM in http_request.headers.get('accept', '')
+
+        # Plain lookups (price, RSI, portfolio value) skip the LLM round trip
+        fast_response = None if compare_symbols else await _try_fast_path(
+            request.message, target_stock, technical_data, request.portfolio
+        )
+        if fast_response is not None:
+            if stream:
+                return _sse_response(iter([_sse({"delta": fast_response}), _sse({}, event="done")]))
+            return {"response": fast_response}
+
+        def build_context() -> str:
+            portfolio_context = generate_portfolio_context(request.portfolio)
+            technical_context = generate_technical_context(target_stock, technical_data, mentioned_symbols)
+            if comparison_data:
+                technical_context += '\n\n' + generate_comparison_context(comparison_data)
+            news_context = generate_news_context(target_stock, news_data, request.portfolioNews, request.marketNews)
+            ml_context = generate_ml_context(target_stock, request.mlPredictions)
+            asset_type_guidance = generate_asset_type_guidance(is_etf)
+
+            # Per-request context goes in its own message after the static prompt,
+            # so the shared prefix stays byte-identical across requests
+            return f"""{asset_type_guidance}
 
 {portfolio_context}
 
@@ -937,62 +1520,71 @@ IMPORTANT: You can answer questions about ANY stock, not just the one currently
 
 {ml_context}
 
-{technical_context}
+{technical_context}"""
 
-Remember:
-- When ML predictions are available, ALWAYS cite the exact predicted prices and percentage returns
-- You have access to news for PORTFOLIO stocks and MARKET trends - use this to identify broader impacts
-- If user asks "what's happening with my portfolio?" or "how's the market?", analyze all portfolio stock news and market news
-- Combine news sentiment across holdings, ML forecasts, and technical analysis for comprehensive recommendations
-- Base your analysis on REAL data provided above, not generic advice
-- The ML model uses 29+ quantitative features and has been backtested
-- When discussing portfolio risk, consider news sentiment across all holdings
-- If the user asks about a stock and you don't have technical data for it, acknowledge that and provide general guidance or offer to analyze it if they want"""
+        # Nothing to analyze (no stock, holdings, predictions or news): a short
+        # prompt without the empty context sections is enough for small talk
+        generic = not (target_stock or request.portfolio or request.mlPredictions
+                       or request.portfolioNews or request.marketNews)
+        if generic:
+            system_messages = [{"role": "system", "content": GENERIC_SYSTEM_PROMPT}]
+            context_prompt = GENERIC_SYSTEM_PROMPT
+        else:
+            # Build context on a worker thread (large portfolios and news lists)
+            context_prompt = await asyncio.to_thread(build_context)
+            system_messages = [
+                {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+                {"role": "system", "content": context_prompt},
+            ]
 
         # Build messages array
-        messages = []
-
-        # Add conversation history (last 10 messages)
-        for msg in request.conversationHistory[-10:]:
-            role = "user" if msg.get("role") == "user" else "assistant"
-            messages.append({
-                "role": role,
-                "content": msg.get("content", "")
-            })
-
-        # Add current message if not in history
-        if not any(msg.get("content") == request.message for msg in request.conversationHistory):
-            messages.append({
-                "role": "user",
-                "content": request.message
-            })
-
-        # Get Groq API key
-        groq_api_key = os.getenv('GROQ_API_KEY')
-        if not groq_api_key:
+        messages = _history_messages(request.conversationHistory, request.message)
+
+        # Opening questions against identical context get the same answer;
+        # follow-ups depend on the conversation so they are never cached
+        chat_key = None if request.conversationHistory else _chat_cache_key(request.message, context_prompt)
+        if chat_key is not None:
+            cached_response = cache.get(chat_key)
+            if cached_response is not None:
+                if stream:
+                    return _sse_response(iter([_sse({"delta": cached_response}), _sse({}, event="done")]))
+                return {"response": cached_response}
+
+        # Shared Groq client, created at startup when GROQ_API_KEY is set
+        client = app.state.groq
+        if client is None:
             raise HTTPException(status_code=500, detail="GROQ_API_KEY not configured")
 
-        # Call Groq API
-        client = Groq(api_key=groq_api_key)
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                *messages
-            ],
+        completion_args = dict(
+            messages=[*system_messages, *messages],
             model="llama-3.3-70b-versatile",
             temperature=0.7,
-            max_tokens=1024
+            max_tokens=CHAT_MAX_TOKENS,
+            stop=["\n\n\n"]
         )
 
+        if stream:
+            return _sse_response(_stream_chat(client, completion_args, chat_key))
+
+        # Call Groq API (blocking client, so off the event loop)
+        chat_completion = await asyncio.to_thread(client.chat.completions.create, **completion_args)
+
         ai_response = chat_completion.choices[0].message.content
+        usage = getattr(chat_completion, 'usage', None)
+        if usage is not None:
+            # Decode (completion) time dominates latency; watch it against prefill
+            logger.debug(
+                "[AI Chat] %d prompt tokens in %.3fs, %d completion tokens in %.3fs",
+                usage.prompt_tokens, usage.prompt_time or 0.0,
+                usage.completion_tokens, usage.completion_time or 0.0
+            )
+        if chat_key is not None:
+            cache.set(chat_key, ai_response, ttl=CHAT_CACHE_TTL)
 
         return {"response": ai_response}
 
     except Exception as e:
-        print(f"AI Chat error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("AI Chat error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate AI response: {str(e)}")
 
 
@@ -1009,24 +1601,20 @@ async def get_recommendations(request: RecommendationsRequest):
         if not request.portfolio:
             return {"recommendations": []}
 
+        # Normalize the holdings once: symbols plus price/quantity/dividend columns
+        symbols = [stock.get('symbol', '') for stock in request.portfolio]
+        prices, quantities, dividends = _holding_columns(request.portfolio, 'price', 'quantity', 'dividend')
+
         # Calculate total portfolio value
-        total_value = sum(stock.get('price', 0) * stock.get('quantity', 0)
-                         for stock in request.portfolio)
+        values = prices * quantities
+        total_value = values.sum()
 
         if total_value == 0:
             return {"recommendations": []}
 
         # Rebalancing recommendations
-        rebalancing_needed = []
-        for stock in request.portfolio:
-            price = stock.get('price', 0)
-            quantity = stock.get('quantity', 0)
-            symbol = stock.get('symbol', '')
-
-            allocation = (price * quantity) / total_value * 100
-
-            if allocation > 40 or allocation < 5:
-                rebalancing_needed.append(symbol)
+        allocations = values / total_value * 100
+        rebalancing_needed = [symbols[i] for i in np.flatnonzero((allocations > 40) | (allocations < 5))]
 
         if rebalancing_needed:
             recommendations.append({
@@ -1058,8 +1646,7 @@ async def get_recommendations(request: RecommendationsRequest):
             })
 
         # Dividend optimization
-        dividend_stocks = [s.get('symbol', '') for s in request.portfolio
-                          if s.get('dividend', 0) > 0]
+        dividend_stocks = [symbols[i] for i in np.flatnonzero(dividends > 0)]
 
         if dividend_stocks:
             recommendations.append({
@@ -1073,41 +1660,43 @@ async def get_recommendations(request: RecommendationsRequest):
         return {"recommendations": recommendations}
 
     except Exception as e:
-        print(f"Recommendations error: {e}")
+        logger.error("Recommendations error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
 
+# Recommendation lookup: rows are return buckets split at -5%, -2%, +2%, +5%
+# (strict inequalities, hence the nudged lower edges); columns are confidence <= / > 75%
+_REC_THRESHOLDS = np.array([np.nextafter(-0.05, -1), np.nextafter(-0.02, -1), 0.02, 0.05])
+_REC_TABLE = np.array([
+    ['SELL', 'STRONG_SELL'],
+    ['SELL', 'SELL'],
+    ['HOLD', 'HOLD'],
+    ['BUY', 'BUY'],
+    ['BUY', 'STRONG_BUY'],
+])
+
+
 def generate_recommendation(expected_return: float, confidence: float) -> str:
     """Generate buy/sell recommendation"""
-    if confidence < 0.6:
+    # A NaN return would sort past every threshold; the comparison chain this
+    # table replaced fell through to HOLD
+    if confidence < 0.6 or np.isnan(expected_return):
         return 'HOLD'
 
-    if expected_return > 0.05 and confidence > 0.75:
-        return 'STRONG_BUY'
-    elif expected_return > 0.02:
-        return 'BUY'
-    elif expected_return < -0.05 and confidence > 0.75:
-        return 'STRONG_SELL'
-    elif expected_return < -0.02:
-        return 'SELL'
-    else:
-        return 'HOLD'
+    return str(_REC_TABLE[np.searchsorted(_REC_THRESHOLDS, expected_return), int(confidence > 0.75)])
 
 
-def generate_analysis(predictions: Dict, performance: Dict, current_price: float) -> str:
+def generate_analysis(predictions: Dict, performance: Dict) -> str:
     """Generate human-readable analysis"""
     next_day = predictions['nextDay']
     next_week = predictions['nextWeek']
     next_month = predictions['nextMonth']
 
-    next_day_return = ((next_day['predictedPrice'] - current_price) / current_price * 100)
-    next_week_return = ((next_week['predictedPrice'] - current_price) / current_price * 100)
-    next_month_return = ((next_month['predictedPrice'] - current_price) / current_price * 100)
-
+    # Returns are already in % in the predictions payload
     analysis = f"""ML models predict:
-• Next Day: {next_day_return:+.2f}% (Confidence: {next_day['confidence']*100:.0f}%)
-• Next Week: {next_week_return:+.2f}% (Confidence: {next_week['confidence']*100:.0f}%)
-• Next Month: {next_month_return:+.2f}% (Confidence: {next_month['confidence']*100:.0f}%)
+• Next Day: {next_day['predictedReturn']:+.2f}% (Confidence: {next_day['confidence']*100:.0f}%)
+• Next Week: {next_week['predictedReturn']:+.2f}% (Confidence: {next_week['confidence']*100:.0f}%)
+• Next Month: {next_month['predictedReturn']:+.2f}% (Confidence: {next_month['confidence']*100:.0f}%)
 
 Model Performance:
 • MAE: ${performance['mae']:.2f}
@@ -1117,20 +1706,21 @@ Model Performance:
 
 Confidence Interval: ${next_day['lowerBound']:.2f} - ${next_day['upperBound']:.2f}
 
-Models: Ridge Regression, Lasso, Random Forest, Gradient Boosting, ARIMA, Exponential Smoothing"""
+Models: Ridge Regression, Lasso, Random Forest, Gradient Boosting, AR(5), Exponential Smoothing"""
 
     return analysis
 
 
 def get_demo_news(symbol: str) -> List[Dict]:
     """Generate demo news data when API key is not available"""
+    now = datetime.now()
     return [
         {
             "title": f"{symbol} Reports Strong Quarterly Earnings",
             "summary": "Company beats analyst expectations with revenue growth of 15% year-over-year.",
             "source": "Financial Times",
             "url": "#",
-            "publishedAt": (datetime.now() - timedelta(hours=2)).isoformat(),
+            "publishedAt": (now - timedelta(hours=2)).isoformat(),
             "sentiment": "positive",
             "image": ""
         },
@@ -1139,122 +1729,252 @@ def get_demo_news(symbol: str) -> List[Dict]:
             "summary": "Major investment firms increase price targets following strong performance.",
             "source": "Bloomberg",
             "url": "#",
-            "publishedAt": (datetime.now() - timedelta(hours=5)).isoformat(),
+            "publishedAt": (now - timedelta(hours=5)).isoformat(),
             "sentiment": "positive",
             "image": ""
         }
     ]
 
 
-def get_popular_stocks_mapping() -> Dict[str, Dict[str, str]]:
+# Popular stocks for search and quote-type lookups (static, read-only)
+POPULAR_STOCKS: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    'AAPL': {'name': 'Apple Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'MSFT': {'name': 'Microsoft Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'GOOGL': {'name': 'Alphabet Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'AMZN': {'name': 'Amazon.com Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'META': {'name': 'Meta Platforms Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'TSLA': {'name': 'Tesla Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'NVDA': {'name': 'NVIDIA Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'AMD': {'name': 'Advanced Micro Devices', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'NFLX': {'name': 'Netflix Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'DIS': {'name': 'The Walt Disney Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'PYPL': {'name': 'PayPal Holdings Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'INTC': {'name': 'Intel Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'CSCO': {'name': 'Cisco Systems Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'ADBE': {'name': 'Adobe Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'CRM': {'name': 'Salesforce Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'ORCL': {'name': 'Oracle Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'IBM': {'name': 'International Business Machines', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'QCOM': {'name': 'QUALCOMM Incorporated', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'TXN': {'name': 'Texas Instruments', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'AVGO': {'name': 'Broadcom Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'COST': {'name': 'Costco Wholesale Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'PEP': {'name': 'PepsiCo Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
+    'KO': {'name': 'The Coca-Cola Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'WMT': {'name': 'Walmart Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'JPM': {'name': 'JPMorgan Chase & Co.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'BAC': {'name': 'Bank of America Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'WFC': {'name': 'Wells Fargo & Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'GS': {'name': 'The Goldman Sachs Group', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'MS': {'name': 'Morgan Stanley', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'C': {'name': 'Citigroup Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'V': {'name': 'Visa Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'MA': {'name': 'Mastercard Incorporated', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'JNJ': {'name': 'Johnson & Johnson', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'UNH': {'name': 'UnitedHealth Group', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'PFE': {'name': 'Pfizer Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'ABBV': {'name': 'AbbVie Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'XOM': {'name': 'Exxon Mobil Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'CVX': {'name': 'Chevron Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
+    'SPY': {'name': 'SPDR S&P 500 ETF Trust', 'type': 'ETF', 'exchange': 'NYSE'},
+    'QQQ': {'name': 'Invesco QQQ Trust', 'type': 'ETF', 'exchange': 'NASDAQ'},
+    'IWM': {'name': 'iShares Russell 2000 ETF', 'type': 'ETF', 'exchange': 'NYSE'},
+    'VTI': {'name': 'Vanguard Total Stock Market ETF', 'type': 'ETF', 'exchange': 'NYSE'},
+})
+
+
+def get_popular_stocks_mapping() -> Mapping[str, Mapping[str, str]]:
     """Mapping of popular stocks for search functionality"""
-    return {
-        'AAPL': {'name': 'Apple Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'MSFT': {'name': 'Microsoft Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'GOOGL': {'name': 'Alphabet Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'AMZN': {'name': 'Amazon.com Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'META': {'name': 'Meta Platforms Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'TSLA': {'name': 'Tesla Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'NVDA': {'name': 'NVIDIA Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'AMD': {'name': 'Advanced Micro Devices', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'NFLX': {'name': 'Netflix Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'DIS': {'name': 'The Walt Disney Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'PYPL': {'name': 'PayPal Holdings Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'INTC': {'name': 'Intel Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'CSCO': {'name': 'Cisco Systems Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'ADBE': {'name': 'Adobe Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'CRM': {'name': 'Salesforce Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'ORCL': {'name': 'Oracle Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'IBM': {'name': 'International Business Machines', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'QCOM': {'name': 'QUALCOMM Incorporated', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'TXN': {'name': 'Texas Instruments', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'AVGO': {'name': 'Broadcom Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'COST': {'name': 'Costco Wholesale Corporation', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'PEP': {'name': 'PepsiCo Inc.', 'type': 'EQUITY', 'exchange': 'NASDAQ'},
-        'KO': {'name': 'The Coca-Cola Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'WMT': {'name': 'Walmart Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'JPM': {'name': 'JPMorgan Chase & Co.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'BAC': {'name': 'Bank of America Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'WFC': {'name': 'Wells Fargo & Company', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'GS': {'name': 'The Goldman Sachs Group', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'MS': {'name': 'Morgan Stanley', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'C': {'name': 'Citigroup Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'V': {'name': 'Visa Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'MA': {'name': 'Mastercard Incorporated', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'JNJ': {'name': 'Johnson & Johnson', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'UNH': {'name': 'UnitedHealth Group', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'PFE': {'name': 'Pfizer Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'ABBV': {'name': 'AbbVie Inc.', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'XOM': {'name': 'Exxon Mobil Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'CVX': {'name': 'Chevron Corporation', 'type': 'EQUITY', 'exchange': 'NYSE'},
-        'SPY': {'name': 'SPDR S&P 500 ETF Trust', 'type': 'ETF', 'exchange': 'NYSE'},
-        'QQQ': {'name': 'Invesco QQQ Trust', 'type': 'ETF', 'exchange': 'NASDAQ'},
-        'IWM': {'name': 'iShares Russell 2000 ETF', 'type': 'ETF', 'exchange': 'NYSE'},
-        'VTI': {'name': 'Vanguard Total Stock Market ETF', 'type': 'ETF', 'exchange': 'NYSE'},
-    }
+    return POPULAR_STOCKS
+
+
+class StockSearchIndex:
+    """
+    Substring search over symbols and names backed by an n-gram index
+
+    Every 1-, 2- and 3-character substring of each lowercased symbol and name
+    maps to the symbols containing it. Queries of up to 3 characters are a
+    single lookup; longer queries intersect their trigram posting sets and
+    confirm the few surviving candidates with a substring check.
+    """
+
+    GRAM = 3
+
+    def __init__(self, stocks: Mapping[str, Mapping[str, str]]):
+        self._stocks = stocks
+        self._rank = {symbol: i for i, symbol in enumerate(stocks)}
+        self._texts = {symbol: (symbol.lower(), data['name'].lower()) for symbol, data in stocks.items()}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        for symbol, texts in self._texts.items():
+            for text in texts:
+                for n in range(1, self.GRAM + 1):
+                    for i in range(len(text) - n + 1):
+                        self._postings[text[i:i + n]].add(symbol)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Stocks whose symbol or name contains the query (case-insensitive)
+
+        Args:
+            query: Search text
+            limit: Maximum number of results
+
+        Returns:
+            Up to `limit` matches in mapping order, as search result dicts
+        """
+        q = query.lower()
+        if len(q) <= self.GRAM:
+            candidates = self._postings.get(q, set())
+        else:
+            grams = {q[i:i + self.GRAM] for i in range(len(q) - self.GRAM + 1)}
+            candidates = set.intersection(*(self._postings.get(g, set()) for g in grams))
+
+        matches = sorted(
+            (symbol for symbol in candidates if any(q in text for text in self._texts[symbol])),
+            key=self._rank.__getitem__
+        )
+        return [
+            {
+                "symbol": symbol,
+                "name": self._stocks[symbol]['name'],
+                "type": self._stocks[symbol]['type'],
+                "exchange": self._stocks[symbol]['exchange']
+            }
+            for symbol in matches[:limit]
+        ]
+
+
+# Built once at import; the popular stock list is static
+stock_search_index = StockSearchIndex(POPULAR_STOCKS)
+POPULAR_QUOTE_TYPES = {symbol: data['type'] for symbol, data in POPULAR_STOCKS.items()}
+
+
+# Company names recognized in chat messages, checked in order
+COMPANY_SYMBOLS: Tuple[Tuple[str, str], ...] = (
+    ('apple', 'AAPL'), ('microsoft', 'MSFT'), ('google', 'GOOGL'), ('alphabet', 'GOOGL'),
+    ('amazon', 'AMZN'), ('meta', 'META'), ('facebook', 'META'), ('tesla', 'TSLA'),
+    ('nvidia', 'NVDA'), ('amd', 'AMD'), ('netflix', 'NFLX'), ('disney', 'DIS'),
+    ('paypal', 'PYPL'), ('intel', 'INTC'), ('cisco', 'CSCO'), ('adobe', 'ADBE'),
+    ('salesforce', 'CRM'), ('oracle', 'ORCL'), ('ibm', 'IBM'), ('qualcomm', 'QCOM'),
+    ('texas instruments', 'TXN'), ('broadcom', 'AVGO'), ('costco', 'COST'),
+    ('pepsi', 'PEP'), ('coca cola', 'KO'), ('walmart', 'WMT'),
+    ('jpmorgan', 'JPM'), ('jp morgan', 'JPM'), ('bank of america', 'BAC'),
+    ('wells fargo', 'WFC'), ('goldman sachs', 'GS'), ('morgan stanley', 'MS'),
+    ('citigroup', 'C'), ('visa', 'V'), ('mastercard', 'MA'),
+    ('johnson & johnson', 'JNJ'), ('unitedhealth', 'UNH'), ('pfizer', 'PFE'),
+    ('abbvie', 'ABBV'), ('exxon', 'XOM'), ('chevron', 'CVX'),
+)
+
+# One scan finds, at every position, the earliest-listed name starting there
+# (lookahead, so overlapping names are all seen); COMPANY_RANK then picks the
+# overall earliest-listed name, matching a scan of COMPANY_SYMBOLS in order
+COMPANY_NAME_PATTERN = re.compile(
+    '(?=(' + '|'.join(re.escape(name) for name, _ in COMPANY_SYMBOLS) + '))'
+)
+COMPANY_RANK = {name: (rank, symbol) for rank, (name, symbol) in enumerate(COMPANY_SYMBOLS)}
+
+SYMBOL_WORD_PATTERN = re.compile(r'\b[A-Z]{1,5}\b')
+
+# Upper-case words that are not ticker symbols
+COMMON_WORDS = frozenset({
+    'I', 'A', 'THE', 'AND', 'OR', 'BUT', 'FOR', 'NOT', 'WITH',
+    'AS', 'AT', 'BY', 'TO', 'FROM', 'IN', 'ON', 'OF', 'IS',
+    'IT', 'AI', 'ML', 'USA', 'US', 'ETF', 'PE', 'PS', 'PB',
+    'RSI', 'MACD', 'SMA', 'EMA', 'OK', 'CEO', 'CFO', 'IPO',
+    'API', 'FAQ',
+})
 
 
 def extract_stock_symbols(message: str) -> List[str]:
     """Extract stock symbols from user message"""
-    import re
-
     lower_message = message.lower()
 
-    # Company name to symbol mapping
-    company_map = {
-        'apple': 'AAPL', 'microsoft': 'MSFT', 'google': 'GOOGL', 'alphabet': 'GOOGL',
-        'amazon': 'AMZN', 'meta': 'META', 'facebook': 'META', 'tesla': 'TSLA',
-        'nvidia': 'NVDA', 'amd': 'AMD', 'netflix': 'NFLX', 'disney': 'DIS',
-        'paypal': 'PYPL', 'intel': 'INTC', 'cisco': 'CSCO', 'adobe': 'ADBE',
-        'salesforce': 'CRM', 'oracle': 'ORCL', 'ibm': 'IBM', 'qualcomm': 'QCOM',
-        'texas instruments': 'TXN', 'broadcom': 'AVGO', 'costco': 'COST',
-        'pepsi': 'PEP', 'coca cola': 'KO', 'walmart': 'WMT',
-        'jpmorgan': 'JPM', 'jp morgan': 'JPM', 'bank of america': 'BAC',
-        'wells fargo': 'WFC', 'goldman sachs': 'GS', 'morgan stanley': 'MS',
-        'citigroup': 'C', 'visa': 'V', 'mastercard': 'MA',
-        'johnson & johnson': 'JNJ', 'unitedhealth': 'UNH', 'pfizer': 'PFE',
-        'abbvie': 'ABBV', 'exxon': 'XOM', 'chevron': 'CVX'
-    }
-
     # Check for company names first
-    for name, symbol in company_map.items():
-        if name in lower_message:
-            return [symbol]
+    names = COMPANY_NAME_PATTERN.findall(lower_message)
+    if names:
+        return [min(COMPANY_RANK[name] for name in names)[1]]
 
     # Then check for uppercase stock symbols
-    symbol_pattern = r'\b[A-Z]{1,5}\b'
-    matches = re.findall(symbol_pattern, message)
-    common_words = ['I', 'A', 'THE', 'AND', 'OR', 'BUT', 'FOR', 'NOT', 'WITH',
-                   'AS', 'AT', 'BY', 'TO', 'FROM', 'IN', 'ON', 'OF', 'IS',
-                   'IT', 'AI', 'ML', 'USA', 'US', 'ETF', 'PE', 'PS', 'PB',
-                   'RSI', 'MACD', 'SMA', 'EMA', 'OK', 'CEO', 'CFO', 'IPO',
-                   'API', 'FAQ']
-    return [m for m in matches if m not in common_words]
+    return [m for m in SYMBOL_WORD_PATTERN.findall(message) if m not in COMMON_WORDS]
+
+
+def _memoize_context(builder: Callable[..., str]) -> Callable[..., str]:
+    """
+    Memoize a chat context builder on the content of its arguments
+
+    Follow-up chat turns resend the same portfolio and predictions payloads, so
+    the arguments are frozen to canonical (key-sorted) JSON and the built string
+    is reused until the payload changes. Only for builders whose output depends
+    on nothing but their (JSON-serializable) arguments.
+    """
+    @lru_cache(maxsize=2048)
+    def build(frozen: bytes) -> str:
+        return builder(*orjson.loads(frozen))
+
+    @wraps(builder)
+    def memoized(*args) -> str:
+        return build(orjson.dumps(args, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS))
 
+    memoized.cache_info = build.cache_info
+    return memoized
 
+
+def _holding_columns(portfolio: List[Dict], *fields: str) -> np.ndarray:
+    """Numeric holding fields (missing = 0) in one pass, as one float64 row per field"""
+    rows = [[stock.get(field, 0) for field in fields] for stock in portfolio]
+    return np.array(rows, dtype=np.float64).reshape(len(portfolio), len(fields)).T
+
+
+def _position_values(portfolio: List[Dict]) -> np.ndarray:
+    """Market value (price * quantity) of each holding, in portfolio order"""
+    prices, quantities = _holding_columns(portfolio, 'price', 'quantity')
+    return prices * quantities
+
+
+@_memoize_context
 def generate_portfolio_context(portfolio: List[Dict]) -> str:
     """Generate portfolio context string for AI chat"""
     if not portfolio:
         return 'The user has no holdings in their portfolio yet.'
 
-    total_value = sum(stock.get('price', 0) * stock.get('quantity', 0) for stock in portfolio)
-
-    holdings = []
-    for stock in portfolio:
-        symbol = stock.get('symbol', '')
-        quantity = stock.get('quantity', 0)
-        price = stock.get('price', 0)
-        value = price * quantity
-        allocation = (value / total_value * 100) if total_value > 0 else 0
+    values = _position_values(portfolio)
+    total_value = float(values.sum())
+    allocations = values / total_value * 100 if total_value > 0 else np.zeros_like(values)
 
-        holdings.append(
-            f"{symbol}: {quantity} shares @ ${price:.2f} ({allocation:.1f}% of portfolio)"
-        )
+    holdings = [
+        f"{stock.get('symbol', '')}: {stock.get('quantity', 0)} shares @ ${stock.get('price', 0):.2f} ({allocation:.1f}% of portfolio)"
+        for stock, allocation in zip(portfolio, allocations.tolist())
+    ]
 
     holdings_str = '\n'.join(holdings)
     return f"Portfolio Summary:\n{holdings_str}\nTotal Portfolio Value: ${total_value:.2f}"
 
 
+# (label, key) pairs for the technical context, in display order
+MACD_FIELDS = (('MACD', 'macd'), ('Signal', 'signal'), ('Histogram', 'histogram'))
+BAND_FIELDS = (('Upper', 'upper'), ('Middle', 'middle'), ('Lower', 'lower'))
+MOVING_AVERAGE_FIELDS = (('SMA20', 'sma20'), ('SMA50', 'sma50'), ('SMA200', 'sma200'))
+
+# (prediction key, header, show range) for the ML context
+PREDICTION_SECTIONS = (
+    ('nextDay', '📊 Next Day Prediction:', True),
+    ('nextWeek', '📈 Next Week Prediction:', False),
+    ('nextMonth', '📉 Next Month Prediction:', False),
+)
+# (label, key, format spec, unit) for backtest results in the ML context
+BACKTEST_FIELDS = (
+    ('Total Returns', 'totalReturns', '+.1f', '%'),
+    ('Win Rate', 'winRate', '.1f', '%'),
+    ('Sharpe Ratio', 'sharpeRatio', '.2f', ''),
+    ('Max Drawdown', 'maxDrawdown', '.1f', '%'),
+)
+
+
+def _fmt_price(value: float) -> str:
+    """Price for prompts: 2 decimals with thousands separators, e.g. 1,234.50"""
+    return f"{float(value):,.2f}"
+
+
 def generate_technical_context(target_stock: Optional[str],
                                technical_data: Optional[Dict],
                                mentioned_symbols: List[str]) -> str:
@@ -1271,54 +1991,98 @@ def generate_technical_context(target_stock: Optional[str],
         else f"Currently viewing {target_stock} with real technical indicators:"
     )
 
-    rsi = technical_data.get('rsi', {})
-    macd = technical_data.get('macd', {})
-    bb = technical_data.get('bollingerBands', {})
-    ma = technical_data.get('movingAverages', {})
-    stoch = technical_data.get('stochastic', {})
-    overall = technical_data.get('overallSignal', 'neutral')
+    # Fields the indicators payload lacks (or reports as 0 for want of
+    # history, e.g. SMA200) are left out rather than shown as 0.00
+    sections = [f"\n{context_prefix}"]
+
+    rsi = technical_data.get('rsi') or {}
+    if rsi.get('value') is not None:
+        sections.append(f"RSI: {rsi['value']:.2f} ({rsi.get('signal', 'neutral')}) - {rsi.get('description', '')}")
+
+    macd = technical_data.get('macd') or {}
+    if macd.get('macd') is not None:
+        values = [f"{label}: {macd[key]:.2f}" for label, key in MACD_FIELDS if macd.get(key) is not None]
+        sections.append(f"{', '.join(values)}\nTrend: {macd.get('trend', 'neutral')} - {macd.get('description', '')}")
+
+    bb = technical_data.get('bollingerBands') or {}
+    bands = [f"{label} {bb[key]:.2f}" for label, key in BAND_FIELDS if bb.get(key)]
+    if bands:
+        sections.append(
+            f"Bollinger Bands: {', '.join(bands)}\n"
+            f"Position: {bb.get('position', 'neutral')} - {bb.get('description', '')}"
+        )
 
-    return f"""
-{context_prefix}
+    ma = technical_data.get('movingAverages') or {}
+    averages = [f"- {label}: {ma[key]:.2f}" for label, key in MOVING_AVERAGE_FIELDS if ma.get(key)]
+    if averages:
+        sections.append(
+            "Moving Averages:\n" + '\n'.join(averages) +
+            f"\nTrend: {ma.get('trend', 'neutral')} - {ma.get('description', '')}"
+        )
 
-RSI: {rsi.get('value', 0):.2f} ({rsi.get('signal', 'neutral')}) - {rsi.get('description', '')}
+    stoch = technical_data.get('stochastic') or {}
+    if stoch.get('k') is not None:
+        d = f", %D {stoch['d']:.2f}" if stoch.get('d') is not None else ''
+        sections.append(
+            f"Stochastic: %K {stoch['k']:.2f}{d}\n"
+            f"Signal: {stoch.get('signal', 'neutral')} - {stoch.get('description', '')}"
+        )
 
-MACD: {macd.get('macd', 0):.2f}, Signal: {macd.get('signal', 0):.2f}, Histogram: {macd.get('histogram', 0):.2f}
-Trend: {macd.get('trend', 'neutral')} - {macd.get('description', '')}
+    overall = technical_data.get('overallSignal', 'neutral')
+    sections.append(f"OVERALL SIGNAL: {overall.upper().replace('_', ' ')}")
+
+    return '\n\n'.join(sections)
+
+
+def generate_comparison_context(comparison_data: Dict[str, Dict]) -> str:
+    """Generate a one-line indicator summary per additionally mentioned stock for AI chat"""
+    lines = []
+    for symbol, technical_data in comparison_data.items():
+        rsi = technical_data.get('rsi', {})
+        macd = technical_data.get('macd', {})
+        bb = technical_data.get('bollingerBands', {})
+        ma = technical_data.get('movingAverages', {})
+        overall = technical_data.get('overallSignal', 'neutral')
+        averages = ', '.join(f"{label} {ma[key]:.2f}" for label, key in MOVING_AVERAGE_FIELDS[1:] if ma.get(key))
+        lines.append(
+            f"{symbol}: RSI {rsi.get('value', 0):.2f} ({rsi.get('signal', 'neutral')}), "
+            f"MACD trend {macd.get('trend', 'neutral')}, "
+            f"Bollinger {bb.get('position', 'neutral')}, "
+            f"MA trend {ma.get('trend', 'neutral')}{f' ({averages})' if averages else ''}, "
+            f"overall {overall.upper().replace('_', ' ')}"
+        )
+    return "Also mentioned (real technical indicators):\n" + '\n'.join(lines)
 
-Bollinger Bands: Upper {bb.get('upper', 0):.2f}, Middle {bb.get('middle', 0):.2f}, Lower {bb.get('lower', 0):.2f}
-Position: {bb.get('position', 'neutral')} - {bb.get('description', '')}
 
-Moving Averages:
-- SMA20: {ma.get('sma20', 0):.2f}
-- SMA50: {ma.get('sma50', 0):.2f}
-- SMA200: {ma.get('sma200', 0):.2f}
-Trend: {ma.get('trend', 'neutral')} - {ma.get('description', '')}
+@lru_cache(maxsize=1024)
+def _parse_published(date_string: str) -> Optional[float]:
+    """Unix timestamp of an ISO date string, or None if it can't be parsed"""
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
 
-Stochastic: %K {stoch.get('k', 0):.2f}, %D {stoch.get('d', 0):.2f}
-Signal: {stoch.get('signal', 'neutral')} - {stoch.get('description', '')}
 
-OVERALL SIGNAL: {overall.upper().replace('_', ' ')}"""
+def _published_ts(item: Dict) -> Optional[float]:
+    """Publish time of a news item, parsed from its `publishedAt`"""
+    return _parse_published(str(item.get('publishedAt', '')))
 
 
-def get_time_ago(date_string: str) -> str:
-    """Format time ago from ISO date string"""
-    try:
-        date = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-        now = datetime.now(date.tzinfo) if date.tzinfo else datetime.now()
-        diff = now - date
-        diff_hours = int(diff.total_seconds() / 3600)
-        diff_days = diff_hours // 24
-
-        if diff_days > 0:
-            return f"{diff_days}d ago"
-        elif diff_hours > 0:
-            return f"{diff_hours}h ago"
-        else:
-            return "Just now"
-    except:
+def get_time_ago(ts: Optional[float]) -> str:
+    """Format time ago from a Unix timestamp"""
+    if ts is None:
         return "Recently"
 
+    days, rem = divmod(max(int(time.time() - ts), 0), 86400)
+    hours = rem // 3600
+
+    if days > 0:
+        return f"{days}d ago"
+    elif hours > 0:
+        return f"{hours}h ago"
+    else:
+        return "Just now"
+
 
 def generate_news_context(target_stock: Optional[str],
                          news_data: List[Dict],
@@ -1331,7 +2095,7 @@ def generate_news_context(target_stock: Optional[str],
     if news_data and target_stock:
         context_parts.append(f"\n📰 LATEST NEWS FOR {target_stock}:")
         for idx, item in enumerate(news_data[:5], 1):
-            time_ago = get_time_ago(item.get('publishedAt', ''))
+            time_ago = get_time_ago(_published_ts(item))
             context_parts.append(f"""
 {idx}. {item.get('title', '')}
    Summary: {item.get('summary', '')}
@@ -1347,7 +2111,7 @@ def generate_news_context(target_stock: Optional[str],
             if stock_news:
                 context_parts.append(f"\n{symbol}:")
                 for idx, item in enumerate(stock_news[:2], 1):
-                    time_ago = get_time_ago(item.get('publishedAt', ''))
+                    time_ago = get_time_ago(_published_ts(item))
                     context_parts.append(
                         f"  {idx}. {item.get('title', '')}\n"
                         f"     {item.get('summary', '')}\n"
@@ -1358,7 +2122,7 @@ def generate_news_context(target_stock: Optional[str],
     if market_news:
         context_parts.append("\n📈 GENERAL MARKET NEWS (SPY/S&P 500):")
         for idx, item in enumerate(market_news[:3], 1):
-            time_ago = get_time_ago(item.get('publishedAt', ''))
+            time_ago = get_time_ago(_published_ts(item))
             context_parts.append(
                 f"{idx}. {item.get('title', '')}\n"
                 f"   {item.get('summary', '')}\n"
@@ -1372,6 +2136,7 @@ def generate_news_context(target_stock: Optional[str],
     return ''
 
 
+@_memoize_context
 def generate_ml_context(target_stock: Optional[str], ml_predictions: Optional[Dict]) -> str:
     """Generate ML predictions context string for AI chat"""
     if not ml_predictions or not target_stock:
@@ -1380,44 +2145,33 @@ def generate_ml_context(target_stock: Optional[str], ml_predictions: Optional[Di
     pred = ml_predictions.get('predictions', {})
     backtest = ml_predictions.get('backtest', {})
 
-    context_parts = [
-        f"\n🤖 MACHINE LEARNING PRICE PREDICTIONS FOR {target_stock}:",
-        f"Current Price: ${ml_predictions.get('current_price', 0)}"
-    ]
-
-    # Next day prediction
-    if 'nextDay' in pred:
-        nd = pred['nextDay']
-        context_parts.append(f"""
-📊 Next Day Prediction:
-   Price: ${nd.get('predictedPrice', 0)} ({'+' if nd.get('predictedReturn', 0) > 0 else ''}{nd.get('predictedReturn', 0)}% return)
-   Confidence: {int(nd.get('confidence', 0) * 100)}%
-   Range: ${nd.get('lowerBound', 0):.2f} - ${nd.get('upperBound', 0):.2f}""")
-
-    # Next week prediction
-    if 'nextWeek' in pred:
-        nw = pred['nextWeek']
-        context_parts.append(f"""
-📈 Next Week Prediction:
-   Price: ${nw.get('predictedPrice', 0)} ({'+' if nw.get('predictedReturn', 0) > 0 else ''}{nw.get('predictedReturn', 0)}% return)
-   Confidence: {int(nw.get('confidence', 0) * 100)}%""")
-
-    # Next month prediction
-    if 'nextMonth' in pred:
-        nm = pred['nextMonth']
-        context_parts.append(f"""
-📉 Next Month Prediction:
-   Price: ${nm.get('predictedPrice', 0)} ({'+' if nm.get('predictedReturn', 0) > 0 else ''}{nm.get('predictedReturn', 0)}% return)
-   Confidence: {int(nm.get('confidence', 0) * 100)}%""")
+    context_parts = [f"\n🤖 MACHINE LEARNING PRICE PREDICTIONS FOR {target_stock}:"]
+    if ml_predictions.get('current_price') is not None:
+        context_parts.append(f"Current Price: ${_fmt_price(ml_predictions['current_price'])}")
+
+    # Per-horizon predictions; missing fields are skipped, not shown as 0
+    for key, header, with_range in PREDICTION_SECTIONS:
+        horizon = pred.get(key)
+        if not horizon:
+            continue
+        lines = [f"\n{header}"]
+        price, ret = horizon.get('predictedPrice'), horizon.get('predictedReturn')
+        if price is not None:
+            change = f" ({float(ret):+.1f}% return)" if ret is not None else ''
+            lines.append(f"   Price: ${_fmt_price(price)}{change}")
+        if horizon.get('confidence') is not None:
+            lines.append(f"   Confidence: {int(horizon['confidence'] * 100)}%")
+        if with_range and horizon.get('lowerBound') is not None and horizon.get('upperBound') is not None:
+            lines.append(f"   Range: ${_fmt_price(horizon['lowerBound'])} - ${_fmt_price(horizon['upperBound'])}")
+        context_parts.append('\n'.join(lines))
 
     # Backtest results
-    if backtest:
-        context_parts.append(f"""
-🎯 Model Performance (Backtesting):
-   Total Returns: {'+' if backtest.get('totalReturns', 0) > 0 else ''}{backtest.get('totalReturns', 0)}%
-   Win Rate: {backtest.get('winRate', 0)}%
-   Sharpe Ratio: {backtest.get('sharpeRatio', 0)}
-   Max Drawdown: {backtest.get('maxDrawdown', 0)}%""")
+    stats = [
+        f"   {label}: {float(backtest[key]):{spec}}{unit}"
+        for label, key, spec, unit in BACKTEST_FIELDS if backtest.get(key) is not None
+    ]
+    if stats:
+        context_parts.append("\n🎯 Model Performance (Backtesting):\n" + '\n'.join(stats))
 
     context_parts.append(f"""
 ⚠️ CRITICAL: When discussing {target_stock} price predictions, YOU MUST cite these EXACT predicted values above. Never estimate or guess - use the precise numbers provided by the ML model.""")
@@ -1445,4 +2199,16 @@ def generate_asset_type_guidance(is_etf: bool) -> str:
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Each worker is a separate process with its own response cache; trained
+    # models are shared through the on-disk model cache
+    workers = SERVER_WORKERS
+    limit_concurrency = os.getenv("LIMIT_CONCURRENCY")
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        limit_concurrency=int(limit_concurrency) if limit_concurrency else None
+    )
@@ -2,11 +2,141 @@
 Professional Backtesting Engine for ML Trading Strategy
 """
 
+import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+from numba import njit
 from models import MLEnsemble
 
+logger = logging.getLogger('quantpilot.ml.backtesting')
+
+TRADE_COLUMNS = ['date', 'action', 'price', 'shares', 'predicted_price', 'confidence', 'profit', 'reason']
+
+ACTION_BUY = 1
+ACTION_SELL = -1
+
+# Indexed by the reason codes returned from _simulate
+SELL_REASONS = (None, 'take_profit', 'stop_loss', 'bearish_signal', 'time_exit', 'final_exit')
+
+
+@njit(cache=True)
+def _simulate(prices, predictions, confidence, commission, initial_capital):
+    """
+    Bar-by-bar trading simulation over the test window
+
+    Trades on one bar per prediction; prices may carry an extra trailing bar
+    used only for the final exit.
+
+    Returns:
+        Tuple of (trade count, per-trade arrays of bar index, action, price,
+        shares, predicted price, confidence, profit and reason code,
+        portfolio values, daily returns, final value)
+    """
+    n = predictions.shape[0]
+    max_trades = n + 1
+    trade_bar = np.empty(max_trades, dtype=np.int64)
+    trade_action = np.empty(max_trades, dtype=np.int8)
+    trade_price = np.empty(max_trades)
+    trade_shares = np.empty(max_trades)
+    trade_pred = np.empty(max_trades)
+    trade_conf = np.empty(max_trades)
+    trade_profit = np.empty(max_trades)
+    trade_reason = np.empty(max_trades, dtype=np.int8)
+    portfolio_values = np.empty(max(n, 1))
+    daily_returns = np.empty(max(n - 2, 0))
+
+    cash = initial_capital
+    shares = 0.0
+    in_position = False
+    entry_price = 0.0
+    n_trades = 0
+    last_buy_bar = -1
+
+    for i in range(n - 1):
+        current_price = prices[i]
+        expected_return = predictions[i]  # Model predicts returns, not prices
+        predicted_price = current_price * (1 + expected_return)
+        pred_confidence = confidence[i]
+
+        current_value = cash + shares * current_price
+        portfolio_values[i] = current_value
+        if i > 0:
+            daily_returns[i - 1] = (current_value - portfolio_values[i - 1]) / portfolio_values[i - 1]
+
+        # BUY: bullish signal (>0.2%), confidence >= 60%, not already long
+        if expected_return > 0.002 and pred_confidence >= 0.60 and not in_position:
+            if cash > 0:
+                shares = cash / (current_price * (1 + commission))
+                cash = 0.0
+                in_position = True
+                entry_price = current_price
+
+                trade_bar[n_trades] = i
+                trade_action[n_trades] = ACTION_BUY
+                trade_price[n_trades] = current_price
+                trade_shares[n_trades] = shares
+                trade_pred[n_trades] = predicted_price
+                trade_conf[n_trades] = pred_confidence
+                trade_profit[n_trades] = 0.0
+                trade_reason[n_trades] = 0
+                n_trades += 1
+                last_buy_bar = i
+
+        # SELL: take profit (+2%), stop loss (-1.5%), bearish signal or time exit
+        # (10 bars after the entry)
+        elif in_position and shares > 0:
+            reason = 0
+            if current_price >= entry_price * 1.02:
+                reason = 1
+            elif current_price <= entry_price * 0.985:
+                reason = 2
+            elif expected_return < -0.002 and pred_confidence >= 0.60:
+                reason = 3
+            elif i - last_buy_bar >= 10:
+                reason = 4
+
+            if reason > 0:
+                sell_price = current_price * (1 - commission)
+                profit = shares * (sell_price - entry_price * (1 + commission))
+                cash = shares * sell_price
+                shares = 0.0
+                in_position = False
+
+                trade_bar[n_trades] = i
+                trade_action[n_trades] = ACTION_SELL
+                trade_price[n_trades] = current_price
+                trade_shares[n_trades] = 0.0
+                trade_pred[n_trades] = predicted_price
+                trade_conf[n_trades] = pred_confidence
+                trade_profit[n_trades] = profit
+                trade_reason[n_trades] = reason
+                n_trades += 1
+
+    # Close final position at market
+    if shares > 0:
+        final_price = prices[prices.shape[0] - 1]
+        sell_price = final_price * (1 - commission)
+        profit = shares * (sell_price - entry_price * (1 + commission))
+        cash = shares * sell_price
+        shares = 0.0
+
+        trade_bar[n_trades] = -1
+        trade_action[n_trades] = ACTION_SELL
+        trade_price[n_trades] = final_price
+        trade_shares[n_trades] = 0.0
+        trade_pred[n_trades] = final_price
+        trade_conf[n_trades] = 0.5
+        trade_profit[n_trades] = profit
+        trade_reason[n_trades] = 5
+        n_trades += 1
+
+    # Final value follows the per-bar values
+    portfolio_values[max(n - 1, 0)] = cash
+
+    return (n_trades, trade_bar, trade_action, trade_price, trade_shares, trade_pred, trade_conf,
+            trade_profit, trade_reason, portfolio_values, daily_returns, cash)
+
 
 class Backtester:
     """Backtest ML trading strategy on historical data"""
@@ -20,8 +150,9 @@ class Backtester:
         self,
         model: MLEnsemble,
         X_test: pd.DataFrame,
-        y_test: pd.Series,
-        dates: List[str]
+        y_test: Union[pd.Series, np.ndarray],
+        dates: List[str],
+        predictions: Optional[Tuple[np.ndarray, np.ndarray]] = None
     ) -> Dict:
         """
         Run backtest of ML trading strategy
@@ -29,145 +160,46 @@ class Backtester:
         Args:
             model: Trained ML ensemble
             X_test: Test features
-            y_test: Actual prices
+            y_test: Actual prices (Series or ndarray, read positionally)
             dates: Corresponding dates
+            predictions: Precomputed (predictions, confidence) for X_test, if
+                the caller already ran the ensemble over it
 
         Returns:
-            Dictionary with backtest results
+            Dictionary with backtest results (trades as a DataFrame)
         """
-        print(f"[Backtest] Running backtest on {len(X_test)} data points")
+        logger.debug("[Backtest] Running backtest on %d data points", len(X_test))
 
         # Get predictions
-        predictions = model.predict(X_test)
-        confidence = model.calculate_confidence(X_test)
-
-        # Initialize trading state
-        cash = self.initial_capital
-        shares = 0
-        position = None  # 'LONG' or None
-        self.trades = []
-        portfolio_values = []
-        daily_returns = []
-        entry_price = 0
-
-        # Trading simulation
-        for i in range(len(X_test) - 1):
-            current_price = y_test.iloc[i]
-            next_price = y_test.iloc[i + 1]
-            predicted_return = predictions[i]  # Model now predicts returns, not prices
-            predicted_price = current_price * (1 + predicted_return)  # Convert to price for display
-            pred_confidence = confidence[i]
-
-            # Expected return (already predicted by model)
-            expected_return = predicted_return
-
-            # Current portfolio value
-            current_value = cash + (shares * current_price)
-            portfolio_values.append(current_value)
-
-            # Calculate daily return
-            if i > 0:
-                daily_return = (current_value - portfolio_values[i-1]) / portfolio_values[i-1]
-                daily_returns.append(daily_return)
-
-            # =================================================================
-            # TRADING LOGIC - More Realistic Strategy
-            # =================================================================
-
-            # BUY CONDITIONS:
-            # 1. Bullish signal (>0.2% expected return)
-            # 2. Good confidence (>=60%)
-            # 3. Not already in position
-            if expected_return > 0.002 and pred_confidence >= 0.60 and position != 'LONG':
-                if cash > 0:
-                    # Buy with available cash (minus commission)
-                    cost = current_price * (1 + self.commission)
-                    shares = cash / cost
-                    cash = 0
-                    position = 'LONG'
-                    entry_price = current_price
-
-                    self.trades.append({
-                        'date': dates[i],
-                        'action': 'BUY',
-                        'price': current_price,
-                        'shares': shares,
-                        'predicted_price': predicted_price,
-                        'confidence': pred_confidence,
-                        'profit': 0
-                    })
-
-            # SELL CONDITIONS:
-            # 1. Take profit: Price increased by 3%+ from entry
-            # 2. Stop loss: Price dropped by 2%+ from entry
-            # 3. Bearish signal: Expected return < -1% with good confidence
-            elif position == 'LONG' and shares > 0:
-                should_sell = False
-                sell_reason = ''
-
-                # Take profit (+2% gain)
-                if current_price >= entry_price * 1.02:
-                    should_sell = True
-                    sell_reason = 'take_profit'
-
-                # Stop loss (-1.5% loss)
-                elif current_price <= entry_price * 0.985:
-                    should_sell = True
-                    sell_reason = 'stop_loss'
-
-                # Bearish signal
-                elif expected_return < -0.002 and pred_confidence >= 0.60:
-                    should_sell = True
-                    sell_reason = 'bearish_signal'
-
-                # Time-based exit (hold for max 10 days)
-                elif len(self.trades) > 0:
-                    last_buy_idx = len([t for t in self.trades if t['action'] == 'BUY']) - 1
-                    if i - last_buy_idx >= 10:
-                        should_sell = True
-                        sell_reason = 'time_exit'
-
-                if should_sell:
-                    # Sell with commission
-                    sell_price = current_price * (1 - self.commission)
-                    profit = shares * (sell_price - entry_price * (1 + self.commission))
-                    cash = shares * sell_price
-                    shares = 0
-                    position = None
-
-                    self.trades.append({
-                        'date': dates[i],
-                        'action': 'SELL',
-                        'price': current_price,
-                        'shares': 0,
-                        'predicted_price': predicted_price,
-                        'confidence': pred_confidence,
-                        'profit': profit,
-                        'reason': sell_reason
-                    })
-
-        # Close final position at market
-        if shares > 0:
-            final_price = y_test.iloc[-1]
-            sell_price = final_price * (1 - self.commission)
-            profit = shares * (sell_price - entry_price * (1 + self.commission))
-            cash = shares * sell_price
-            shares = 0
-
-            self.trades.append({
-                'date': dates[-1] if len(dates) > 0 else 'final',
-                'action': 'SELL',
-                'price': final_price,
-                'shares': 0,
-                'predicted_price': final_price,
-                'confidence': 0.5,
-                'profit': profit,
-                'reason': 'final_exit'
-            })
-
-        # Append final value
-        final_value = cash
-        portfolio_values.append(final_value)
+        if predictions is None:
+            predictions = model.predict_with_confidence(X_test)
+        predictions, confidence = predictions
+        prices = np.asarray(y_test, dtype=np.float64)
+
+        n_trades, trade_bar, trade_action, trade_price, trade_shares, trade_pred, trade_conf, \
+            trade_profit, trade_reason, portfolio_values, daily_returns, final_value = _simulate(
+                prices,
+                np.asarray(predictions, dtype=np.float64),
+                np.asarray(confidence, dtype=np.float64),
+                self.commission,
+                self.initial_capital
+            )
+
+        # The final exit is recorded at bar -1 (last date)
+        final_date = dates[-1] if len(dates) > 0 else 'final'
+        trade_dates = [dates[b] if b >= 0 else final_date for b in trade_bar[:n_trades]]
+
+        # Columnar trade log for vectorized metrics
+        self.trades = pd.DataFrame({
+            'date': trade_dates,
+            'action': np.where(trade_action[:n_trades] == ACTION_BUY, 'BUY', 'SELL'),
+            'price': trade_price[:n_trades],
+            'shares': trade_shares[:n_trades],
+            'predicted_price': trade_pred[:n_trades],
+            'confidence': trade_conf[:n_trades],
+            'profit': trade_profit[:n_trades],
+            'reason': [SELL_REASONS[r] for r in trade_reason[:n_trades]]
+        }, columns=TRADE_COLUMNS)
 
         # Calculate metrics
         metrics = self._calculate_metrics(portfolio_values, daily_returns, final_value)
@@ -182,8 +214,8 @@ class Backtester:
 
     def _calculate_metrics(
         self,
-        portfolio_values: List[float],
-        daily_returns: List[float],
+        portfolio_values: np.ndarray,
+        daily_returns: np.ndarray,
         final_value: float
     ) -> Dict:
         """Calculate comprehensive backtest metrics"""
@@ -210,26 +242,22 @@ class Backtester:
             else:
                 sharpe_ratio = 0
 
-        # Maximum Drawdown
+        # Maximum Drawdown (running peak starts at the initial capital)
         max_drawdown = 0
-        peak = self.initial_capital
-        for value in portfolio_values:
-            if value > peak:
-                peak = value
-            drawdown = (peak - value) / peak if peak > 0 else 0
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
+        if len(portfolio_values) and self.initial_capital > 0:
+            peaks = np.maximum.accumulate(np.maximum(portfolio_values, self.initial_capital))
+            max_drawdown = ((peaks - portfolio_values) / peaks).max()
 
         # Win Rate & Trade Statistics
-        sell_trades = [t for t in self.trades if t['action'] == 'SELL']
-        winning_trades = [t for t in sell_trades if t.get('profit', 0) > 0]
-        losing_trades = [t for t in sell_trades if t.get('profit', 0) < 0]
+        sell_profits = self.trades.loc[self.trades['action'] == 'SELL', 'profit']
+        winning_profits = sell_profits[sell_profits > 0]
+        losing_profits = sell_profits[sell_profits < 0]
 
-        win_rate = (len(winning_trades) / len(sell_trades) * 100) if sell_trades else 0
+        win_rate = (sell_profits > 0).mean() * 100 if len(sell_profits) else 0
 
         # Profit Factor
-        gross_profit = sum(t.get('profit', 0) for t in winning_trades)
-        gross_loss = abs(sum(t.get('profit', 0) for t in losing_trades))
+        gross_profit = winning_profits.sum()
+        gross_loss = -losing_profits.sum()
 
         if gross_loss > 0:
             profit_factor = gross_profit / gross_loss
@@ -239,11 +267,11 @@ class Backtester:
             profit_factor = 1.0
 
         # Average win/loss
-        avg_win = (gross_profit / len(winning_trades)) if winning_trades else 0
-        avg_loss = (gross_loss / len(losing_trades)) if losing_trades else 0
+        avg_win = winning_profits.mean() if len(winning_profits) else 0
+        avg_loss = -losing_profits.mean() if len(losing_profits) else 0
 
         # Expectancy
-        if sell_trades:
+        if len(sell_profits):
             expectancy = (win_rate / 100 * avg_win) - ((1 - win_rate / 100) * avg_loss)
         else:
             expectancy = 0
@@ -256,8 +284,8 @@ class Backtester:
             'win_rate': float(win_rate),
             'profit_factor': float(profit_factor),
             'num_trades': len(self.trades),
-            'num_wins': len(winning_trades),
-            'num_losses': len(losing_trades),
+            'num_wins': len(winning_profits),
+            'num_losses': len(losing_profits),
             'avg_win': float(avg_win),
             'avg_loss': float(avg_loss),
             'expectancy': float(expectancy),
@@ -265,15 +293,9 @@ class Backtester:
         }
 
     def _calculate_total_commission(self) -> float:
-        """Calculate total commission paid"""
-        total = 0
-        for trade in self.trades:
-            if trade['action'] == 'BUY':
-                total += trade['price'] * trade['shares'] * self.commission
-            elif trade['action'] == 'SELL' and 'profit' in trade:
-                # Estimate sell commission (already accounted in profit, but track separately)
-                pass
-        return total
+        """Calculate total commission paid on entries"""
+        buys = self.trades[self.trades['action'] == 'BUY']
+        return float((buys['price'] * buys['shares']).sum() * self.commission)
 
 
 def walk_forward_validation(
@@ -292,7 +314,7 @@ def walk_forward_validation(
 
     num_windows = (len(X) - train_size) // test_size
 
-    print(f"[Walk-Forward] Running {num_windows} validation windows")
+    logger.debug("[Walk-Forward] Running %d validation windows", num_windows)
 
     for i in range(num_windows):
         start_idx = i * test_size
@@ -2,16 +2,27 @@
 Simple in-memory cache with TTL support
 """
 
+import logging
+import threading
 import time
-from typing import Any, Optional, Dict
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import Any, Optional, Dict, Tuple
+
+logger = logging.getLogger('quantpilot.ml.cache')
 
 
 class SimpleCache:
-    """Thread-safe in-memory cache with TTL"""
+    """Thread-safe in-memory LRU cache with TTL"""
 
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: Maximum entries; the least recently used is evicted beyond it
+        """
+        self.max_size = max_size
+        # key -> (value, expires_at, stale_until), least recently used first
+        self._cache: 'OrderedDict[str, Tuple[Any, float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
 
     def get(self, key: str) -> Optional[Any]:
         """
@@ -23,19 +34,38 @@ class SimpleCache:
         Returns:
             Cached value or None if not found/expired
         """
-        if key not in self._cache:
+        value, is_stale = self.get_with_state(key)
+        if is_stale:
             return None
+        return value
 
-        entry = self._cache[key]
-        if time.time() > entry['expires_at']:
-            # Expired, remove it
-            del self._cache[key]
-            return None
+    def get_with_state(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Get value from cache, including entries past their TTL but still
+        within their stale window
 
-        print(f"[Cache] HIT: {key}")
-        return entry['value']
+        Args:
+            key: Cache key
 
-    def set(self, key: str, value: Any, ttl: int = 300):
+        Returns:
+            (value, is_stale) - value is None if not found or past the stale window
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None, False
+
+            value, expires_at, stale_until = entry
+            if now > stale_until:
+                # Expired, remove it
+                del self._cache[key]
+                return None, False
+
+            self._cache.move_to_end(key)
+            return value, now > expires_at
+
+    def set(self, key: str, value: Any, ttl: int = 300, stale_ttl: int = 0):
         """
         Set value in cache with TTL
 
@@ -43,45 +73,52 @@ class SimpleCache:
             key: Cache key
             value: Value to cache
             ttl: Time to live in seconds (default 5 minutes)
+            stale_ttl: Extra seconds the value may still be served as stale
+                while it is refreshed (see get_with_state)
         """
-        self._cache[key] = {
-            'value': value,
-            'expires_at': time.time() + ttl,
-            'created_at': datetime.now().isoformat()
-        }
-        print(f"[Cache] SET: {key} (TTL: {ttl}s)")
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._cache[key] = (value, expires_at, expires_at + stale_ttl)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
 
     def delete(self, key: str):
         """Delete a specific key from cache"""
-        if key in self._cache:
-            del self._cache[key]
-            print(f"[Cache] DELETE: {key}")
+        with self._lock:
+            removed = self._cache.pop(key, None) is not None
+        if removed:
+            logger.debug("[Cache] DELETE: %s", key)
 
     def clear(self):
         """Clear all cache entries"""
-        count = len(self._cache)
-        self._cache.clear()
-        print(f"[Cache] CLEARED: {count} entries removed")
+        with self._lock:
+            count = len(self._cache)
+            self._cache.clear()
+        logger.info("[Cache] CLEARED: %d entries removed", count)
 
     def cleanup_expired(self):
         """Remove all expired entries"""
         current_time = time.time()
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if current_time > entry['expires_at']
-        ]
-        for key in expired_keys:
-            del self._cache[key]
+        with self._lock:
+            expired_keys = [
+                key for key, entry in self._cache.items()
+                if current_time > entry[2]
+            ]
+            for key in expired_keys:
+                del self._cache[key]
 
         if expired_keys:
-            print(f"[Cache] CLEANUP: Removed {len(expired_keys)} expired entries")
+            logger.debug("[Cache] CLEANUP: Removed %d expired entries", len(expired_keys))
 
     def stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        return {
-            'total_entries': len(self._cache),
-            'keys': list(self._cache.keys())
-        }
+        with self._lock:
+            return {
+                'total_entries': len(self._cache),
+                'max_size': self.max_size,
+                'keys': list(self._cache.keys())
+            }
 
 
 # Global cache instance
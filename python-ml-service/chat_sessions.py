@@ -0,0 +1,98 @@
+"""
+Server-side store for chat session payloads (portfolio, predictions, news)
+"""
+
+import os
+import re
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+import orjson
+
+_SESSION_ID = re.compile(r'[A-Za-z0-9_-]{22}')
+
+
+class ChatSessionStore:
+    """
+    Chat payloads stored once and referenced by session ID on every turn
+
+    Sessions are orjson files in a directory shared by all worker processes,
+    so any worker can serve any turn. The TTL is sliding: each read extends it.
+    """
+
+    def __init__(self, session_dir: str = '.cache/chat_sessions', ttl: int = 900):
+        """
+        Args:
+            session_dir: Directory for session files (shared across worker processes)
+            ttl: Seconds a session lives after it was last used
+        """
+        self.session_dir = session_dir
+        self.ttl = ttl
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    def create(self, payload: Dict[str, Any]) -> str:
+        """
+        Store a session payload
+
+        Args:
+            payload: JSON-serializable chat payloads
+
+        Returns:
+            New session ID
+        """
+        session_id = secrets.token_urlsafe(16)
+        path = self._path(session_id)
+        os.makedirs(self.session_dir, exist_ok=True)
+        # Write then rename so other workers never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(payload))
+        os.replace(tmp_path, path)
+        self.cleanup_expired()
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a session payload and extend its TTL
+
+        Args:
+            session_id: ID returned by create()
+
+        Returns:
+            Stored payload, or None if unknown/expired
+        """
+        if not _SESSION_ID.fullmatch(session_id):
+            return None
+
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                payload = orjson.loads(f.read())
+            os.utime(path)
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        return payload
+
+    def cleanup_expired(self):
+        """Remove session files past their TTL"""
+        cutoff = time.time() - self.ttl
+        try:
+            entries = list(os.scandir(self.session_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# Global session store
+chat_sessions = ChatSessionStore(session_dir=os.getenv('CHAT_SESSION_DIR', '.cache/chat_sessions'))
@@ -5,14 +5,17 @@ Extracts 40+ features from historical price data
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bars of history every feature row needs (the longest lookback is the 200-day SMA)
+WARMUP_BARS = 200
 
 
 def calculate_rsi(prices: pd.Series, period: int = 14) -> float:
     """Calculate RSI using Wilder's smoothing method"""
     delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
 
     rs = gain / loss
     rsi = 100 - (100 / (1 + rs))
@@ -95,7 +98,7 @@ def calculate_vwap(df: pd.DataFrame, period: int = 20) -> float:
     """Calculate Volume Weighted Average Price"""
     typical_price = (df['high'] + df['low'] + df['close']) / 3
     vwap = (typical_price * df['volume']).rolling(window=period).sum() / df['volume'].rolling(window=period).sum()
-    return vwap.iloc[-1] if not pd.isna(vwap.iloc[-1]) else df['close'].iloc[-1]
+    return vwap.iloc[-1] if not pd.isna(vwap.iloc[-1]) else df['close'].to_numpy()[-1]
 
 
 def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = None) -> Dict[str, float]:
@@ -103,14 +106,11 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
     Extract high-signal features for ML prediction
     Focus on features proven to work in quantitative trading
     """
-    if len(df) < 200:
-        raise ValueError(f"Need at least 200 data points, got {len(df)}")
+    if len(df) < WARMUP_BARS:
+        raise ValueError(f"Need at least {WARMUP_BARS} data points, got {len(df)}")
 
-    # Use all data up to index
-    if index == -1:
-        data = df.copy()
-    else:
-        data = df.iloc[:index + 1].copy()
+    # Use all data up to index (read-only, so a view rather than a copy)
+    data = df if index == -1 else df.iloc[:index + 1]
 
     current = data.iloc[-1]
     close_prices = data['close']
@@ -124,10 +124,12 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
     # 1. MOMENTUM FEATURES (trend-following)
     # =================================================================
 
-    # Log returns (more stable than simple returns)
-    features['log_return_1d'] = np.log(close_prices.iloc[-1] / close_prices.iloc[-2]) if len(close_prices) > 1 else 0
-    features['log_return_5d'] = np.log(close_prices.iloc[-1] / close_prices.iloc[-6]) if len(close_prices) > 5 else 0
-    features['log_return_21d'] = np.log(close_prices.iloc[-1] / close_prices.iloc[-22]) if len(close_prices) > 21 else 0
+    # Log returns (more stable than simple returns), as differences of log closes
+    close_np = close_prices.to_numpy(dtype=np.float64)
+    log_close = np.log(close_np[-22:])
+    features['log_return_1d'] = log_close[-1] - log_close[-2] if len(close_np) > 1 else 0
+    features['log_return_5d'] = log_close[-1] - log_close[-6] if len(close_np) > 5 else 0
+    features['log_return_21d'] = log_close[-1] - log_close[-22] if len(close_np) > 21 else 0
 
     # MACD (momentum indicator)
     macd = calculate_macd(close_prices)
@@ -162,10 +164,11 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
     # 3. VOLATILITY FEATURES
     # =================================================================
 
-    # Realized volatility (annualized)
-    returns = close_prices.pct_change()
-    features['realized_vol_5d'] = returns.iloc[-5:].std() * np.sqrt(252) if len(returns) >= 5 else 0
-    features['realized_vol_21d'] = returns.iloc[-21:].std() * np.sqrt(252) if len(returns) >= 21 else 0
+    # Realized volatility (annualized), from the last 63 daily returns only
+    tail = close_np[-64:]
+    returns = np.diff(tail) / tail[:-1]
+    features['realized_vol_5d'] = np.std(returns[-5:], ddof=1) * np.sqrt(252) if len(close_np) >= 6 else 0
+    features['realized_vol_21d'] = np.std(returns[-21:], ddof=1) * np.sqrt(252) if len(close_np) >= 22 else 0
 
     # ATR (normalized by price)
     atr = calculate_atr(data, 14)
@@ -176,15 +179,15 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
 
     # Parkinson volatility estimator (more efficient than close-to-close)
     if len(data) >= 20:
-        hl_ratio = np.log(high_prices.iloc[-20:] / low_prices.iloc[-20:])
-        parkinson_vol = np.sqrt(np.mean(hl_ratio ** 2) / (4 * np.log(2))) * np.sqrt(252)
+        hl_ratio = np.log(high_prices.to_numpy(dtype=np.float64)[-20:] / low_prices.to_numpy(dtype=np.float64)[-20:])
+        parkinson_vol = np.sqrt(np.dot(hl_ratio, hl_ratio) / 20 / (4 * np.log(2))) * np.sqrt(252)
         features['parkinson_vol'] = parkinson_vol
     else:
         features['parkinson_vol'] = 0
 
     # Volatility regime (high vs low)
     vol_21d = features['realized_vol_21d']
-    vol_63d = returns.iloc[-63:].std() * np.sqrt(252) if len(returns) >= 63 else vol_21d
+    vol_63d = np.std(returns[-63:], ddof=1) * np.sqrt(252) if len(close_np) >= 64 else vol_21d
     features['vol_regime'] = (vol_21d / vol_63d - 1) if vol_63d > 0 else 0
 
     # =================================================================
@@ -233,11 +236,14 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
                 # Simple linear regression beta
                 valid_idx = ~(stock_returns.isna() | spy_returns[-len(stock_returns):].isna())
                 if valid_idx.sum() >= 21:
-                    recent_stock = stock_returns[valid_idx].iloc[-21:]
-                    recent_spy = spy_returns[-len(stock_returns):][valid_idx].iloc[-21:]
-
-                    covariance = recent_stock.cov(recent_spy)
-                    spy_variance = recent_spy.var()
+                    recent_stock = stock_returns[valid_idx].to_numpy()[-21:]
+                    recent_spy = spy_returns[-len(stock_returns):][valid_idx].to_numpy()[-21:]
+
+                    # Sample covariance/variance (ddof=1) as dot products of the deviations
+                    stock_dev = recent_stock - recent_stock.mean()
+                    spy_dev = recent_spy - recent_spy.mean()
+                    covariance = np.dot(stock_dev, spy_dev) / (len(spy_dev) - 1)
+                    spy_variance = np.dot(spy_dev, spy_dev) / (len(spy_dev) - 1)
                     beta = covariance / spy_variance if spy_variance > 0 else 1.0
 
                     # Market residual return (alpha)
@@ -294,7 +300,156 @@ def extract_features(df: pd.DataFrame, index: int = -1, spy_df: pd.DataFrame = N
     return features
 
 
-def engineer_dataset(df: pd.DataFrame, look_forward: int = 1, spy_df: pd.DataFrame = None) -> Tuple[pd.DataFrame, pd.Series, List[str], pd.Series]:
+def extract_features_batch(df: pd.DataFrame, indices, spy_df: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Vectorized extract_features() for many rows at once
+
+    Every indicator is computed once over the full arrays with causal rolling
+    windows, so row i only sees data up to i, exactly like
+    extract_features(df, i, spy_df.iloc[:i + 1]).
+
+    Args:
+        df: Stock price data
+        indices: Positional row indices to extract
+        spy_df: SPY (market) data aligned positionally with df
+
+    Returns:
+        DataFrame with one row per index, columns in extract_features() order
+    """
+    if len(df) < WARMUP_BARS:
+        raise ValueError(f"Need at least {WARMUP_BARS} data points, got {len(df)}")
+
+    close = pd.Series(df['close'].to_numpy(dtype=np.float64))
+    high = pd.Series(df['high'].to_numpy(dtype=np.float64))
+    low = pd.Series(df['low'].to_numpy(dtype=np.float64))
+    open_ = pd.Series(df['open'].to_numpy(dtype=np.float64))
+    volume = pd.Series(df['volume'].to_numpy(dtype=np.float64))
+    n_rows = np.arange(1, len(df) + 1)  # Rows of history available at each index
+    sqrt_252 = np.sqrt(252)
+
+    features = {}
+
+    # 1. Momentum
+    log_close = pd.Series(np.log(close.to_numpy()))
+    features['log_return_1d'] = np.where(n_rows > 1, log_close - log_close.shift(1), 0)
+    features['log_return_5d'] = np.where(n_rows > 5, log_close - log_close.shift(5), 0)
+    features['log_return_21d'] = np.where(n_rows > 21, log_close - log_close.shift(21), 0)
+
+    ema_fast = close.ewm(span=12, adjust=False).mean()
+    ema_slow = close.ewm(span=26, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    macd_signal = macd.ewm(span=9, adjust=False).mean()
+    features['macd_line'] = macd
+    features['macd_signal'] = macd_signal
+    features['macd_histogram'] = macd - macd_signal
+
+    # 2. Mean reversion
+    # Wilder's smoothing, as in calculate_rsi
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    rsi = (100 - (100 / (1 + gain / loss))).fillna(50.0)
+    features['rsi'] = rsi
+    features['rsi_oversold'] = (rsi < 30).astype(int)
+    features['rsi_overbought'] = (rsi > 70).astype(int)
+
+    sma_20 = close.rolling(window=20).mean()
+    std_20 = close.rolling(window=20).std()
+    bb_width = 4 * std_20
+    features['bb_zscore'] = np.where(bb_width > 0, (close - sma_20) / (bb_width / 4), 0)
+
+    ema_20 = close.ewm(span=20, adjust=False).mean()
+    ema_50 = close.ewm(span=50, adjust=False).mean()
+    features['price_to_ema20'] = np.where(ema_20 > 0, close / ema_20 - 1, 0)
+    features['price_to_ema50'] = np.where(ema_50 > 0, close / ema_50 - 1, 0)
+
+    # 3. Volatility
+    returns = close.pct_change()
+    vol_5d = returns.rolling(window=5, min_periods=1).std() * sqrt_252
+    vol_21d = returns.rolling(window=21, min_periods=1).std() * sqrt_252
+    vol_63d = returns.rolling(window=63, min_periods=1).std() * sqrt_252
+    features['realized_vol_5d'] = np.where(n_rows >= 5, vol_5d, 0)
+    features['realized_vol_21d'] = np.where(n_rows >= 21, vol_21d, 0)
+
+    prev_close = close.shift()
+    tr = pd.concat([high - low, np.abs(high - prev_close), np.abs(low - prev_close)], axis=1).max(axis=1)
+    atr = tr.rolling(window=14).mean().fillna(0.0)
+    features['atr_normalized'] = np.where(close > 0, atr / close, 0)
+    features['hl_range_normalized'] = np.where(close > 0, (high - low) / close, 0)
+
+    hl_ratio_sq = np.log(high / low) ** 2
+    parkinson_vol = np.sqrt(hl_ratio_sq.rolling(window=20).mean() / (4 * np.log(2))) * sqrt_252
+    features['parkinson_vol'] = np.where(n_rows >= 20, parkinson_vol, 0)
+
+    vol_21d = pd.Series(features['realized_vol_21d'])
+    vol_63d = pd.Series(np.where(n_rows >= 63, vol_63d, vol_21d))
+    features['vol_regime'] = np.where(vol_63d > 0, vol_21d / vol_63d - 1, 0)
+
+    # 4. Liquidity / microstructure
+    volume_mean = volume.rolling(window=20, min_periods=1).mean()
+    volume_std = volume.rolling(window=20, min_periods=1).std()
+    features['volume_zscore'] = np.where(volume_std > 0, (volume - volume_mean) / volume_std, 0)
+
+    prev_volume = volume.shift()
+    features['volume_change'] = np.where((n_rows > 1) & (prev_volume > 0), volume / prev_volume - 1, 0)
+    features['turnover'] = volume * close
+
+    typical_price = (high + low + close) / 3
+    vwap = (typical_price * volume).rolling(window=20).sum() / volume.rolling(window=20).sum()
+    vwap = vwap.fillna(close)
+    features['vwap_deviation'] = np.where(vwap > 0, close / vwap - 1, 0)
+
+    vol_sma_5 = volume.rolling(window=5, min_periods=1).mean()
+    vol_sma_20 = volume.rolling(window=20, min_periods=1).mean()
+    features['volume_trend'] = np.where(vol_sma_20 > 0, vol_sma_5 / vol_sma_20 - 1, 0)
+
+    # 5. Relative strength vs market (rows past the end of SPY get neutral values)
+    residual = np.zeros(len(df))
+    beta = np.ones(len(df))
+    relative_strength = np.zeros(len(df))
+    if spy_df is not None:
+        n_spy = min(len(spy_df), len(df))
+        spy_close = pd.Series(spy_df['close'].to_numpy(dtype=np.float64)[:n_spy])
+        spy_returns = spy_close.pct_change()
+        stock_returns = returns.iloc[:n_spy]
+
+        covariance = stock_returns.rolling(window=21).cov(spy_returns)
+        spy_variance = spy_returns.rolling(window=21).var()
+        has_window = covariance.notna().to_numpy()
+        spy_beta = np.where(spy_variance > 0, covariance / spy_variance, 1.0)
+        spy_beta = np.where(has_window, spy_beta, 1.0)
+
+        beta[:n_spy] = spy_beta
+        residual[:n_spy] = np.where(has_window, stock_returns - spy_beta * spy_returns, 0)
+
+        has_21d = n_rows[:n_spy] >= 22
+        spy_return_21d = np.where(has_21d, spy_close / spy_close.shift(21) - 1, 0)
+        stock_return_21d = np.where(has_21d, close.iloc[:n_spy] / close.shift(21).iloc[:n_spy] - 1, 0)
+        relative_strength[:n_spy] = stock_return_21d - spy_return_21d
+    features['market_residual_return'] = residual
+    features['beta_to_spy'] = beta
+    features['relative_strength_vs_spy'] = relative_strength
+
+    # 6. Additional clean signals
+    features['gap'] = np.where((n_rows > 1) & (prev_close > 0), open_ / prev_close - 1, 0)
+    features['intraday_return'] = np.where(open_ > 0, close / open_ - 1, 0)
+    daily_range = high - low
+    features['price_position'] = np.where(daily_range > 0, (close - low) / daily_range, 0.5)
+
+    features_df = pd.DataFrame(
+        {name: np.asarray(values)[indices] for name, values in features.items()}
+    )
+
+    # Replace NaN and inf values with appropriate defaults
+    return features_df.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+
+def engineer_dataset(
+    df: pd.DataFrame,
+    look_forward: int = 1,
+    spy_df: pd.DataFrame = None,
+    include_last: bool = False
+) -> Tuple[pd.DataFrame, pd.Series, List[str], pd.Series]:
     """
     Engineer complete dataset for ML training
 
@@ -302,45 +457,37 @@ def engineer_dataset(df: pd.DataFrame, look_forward: int = 1, spy_df: pd.DataFra
         df: Stock price data
         look_forward: Days ahead to predict
         spy_df: SPY (market) data for calculating beta and residual returns
+        include_last: Also build the trailing rows that have no target yet
+            (their targets are NaN), so the current row comes from the same pass
 
     Returns:
         features_df: DataFrame with all features
         targets: Series with target RETURNS (not prices!)
         dates: List of dates
-        prices: Series with current prices (for converting returns back to prices)
+        prices: Series with current prices (for converting returns back to prices),
+            row i being df row WARMUP_BARS + i
     """
-    features_list = []
-    returns_targets = []
-    dates = []
-    current_prices = []
-
-    # Start from index 200 (need history for indicators)
-    for i in range(200, len(df) - look_forward):
-        try:
-            # Extract SPY data up to same point for fair comparison
-            spy_slice = None
-            if spy_df is not None:
-                spy_slice = spy_df.iloc[:i + 1] if i < len(spy_df) else spy_df
-
-            feature_dict = extract_features(df, i, spy_df=spy_slice)
-            features_list.append(feature_dict)
-
-            # Target: RETURN (not absolute price!)
-            current_price = df.iloc[i]['close']
-            future_price = df.iloc[i + look_forward]['close']
-            return_target = (future_price - current_price) / current_price
-
-            returns_targets.append(return_target)
-            current_prices.append(current_price)
-            dates.append(df.iloc[i]['date'] if 'date' in df.columns else str(df.index[i]))
-        except Exception as e:
-            print(f"Error extracting features at index {i}: {e}")
-            continue
-
-    features_df = pd.DataFrame(features_list)
-    returns_series = pd.Series(returns_targets)
+    end = len(df) if include_last else len(df) - look_forward
+
+    # Start after the warmup (need history for indicators)
+    indices = np.arange(WARMUP_BARS, max(end, WARMUP_BARS))
+    features_df = extract_features_batch(df, indices, spy_df=spy_df)
+
+    # Target: RETURN (not absolute price!), NaN where no future price exists yet
+    close_np = df['close'].to_numpy()
+    current_prices = close_np[indices]
+    future_idx = indices + look_forward
+    has_future = future_idx < len(df)
+    future_prices = np.full(len(indices), np.nan)
+    future_prices[has_future] = close_np[future_idx[has_future]]
+    returns_series = pd.Series((future_prices - current_prices) / current_prices)
     prices_series = pd.Series(current_prices)
 
+    if 'date' in df.columns:
+        dates = pd.to_datetime(df['date'].iloc[indices]).dt.strftime('%Y-%m-%d').tolist()
+    else:
+        dates = [str(df.index[i]) for i in indices]
+
     return features_df, returns_series, dates, prices_series
 
 
@@ -374,3 +521,54 @@ def normalize_features(features_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[st
     normalized_df = normalized_df.fillna(0)
 
     return normalized_df, means, stds
+
+
+def prepare_training_data(df: pd.DataFrame, spy_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Build the normalized 80/20 train/test split for /predict
+
+    Pure function of its arguments so it can run in a worker process.
+
+    Args:
+        df: Historical OHLCV data for the symbol
+        spy_df: SPY history for market-relative features, if available
+
+    Returns:
+        Dictionary with the train/test split, test dates, test-period close
+        prices (one extra trailing bar for the last next-day price), split
+        index, current (unnormalized) features, feature names and the
+        training means/stds as vectors in feature order
+    """
+    X, y_returns, dates, prices = engineer_dataset(df, 1, spy_df, include_last=True)
+
+    # The final row has no next-day target yet: it is the row we predict from
+    current_features = X.iloc[-1].to_dict()
+    X, y_returns, dates = X.iloc[:-1], y_returns.iloc[:-1], dates[:-1]
+
+    # Normalize features
+    X_normalized, means, stds = normalize_features(X)
+
+    # Train in float32 to halve memory traffic; targets, means and stds stay
+    # float64 so residual statistics are not computed in single precision
+    X_normalized = X_normalized.astype(np.float32, copy=False)
+
+    # Train/test split (80/20)
+    split_idx = int(len(X) * 0.8)
+    feature_names = X_normalized.columns.tolist()
+
+    return {
+        'X_train': X_normalized.iloc[:split_idx],
+        'y_train': y_returns.iloc[:split_idx],  # Training on returns
+        'X_test': X_normalized.iloc[split_idx:],
+        'y_test': y_returns.iloc[split_idx:],  # Testing on returns
+        'test_dates': dates[split_idx:],
+        # Aligned with X, and prices still holds the current row, so this
+        # slice already ends with the price after the final test day
+        'test_prices': prices.to_numpy()[split_idx:],
+        'split_idx': split_idx,
+        'current_features': current_features,
+        'feature_names': feature_names,
+        # Training statistics as vectors in model column order
+        'means': np.array([means[name] for name in feature_names]),
+        'stds': np.array([stds[name] for name in feature_names]),
+    }
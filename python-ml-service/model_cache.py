@@ -0,0 +1,182 @@
+"""
+Trained model cache with on-disk persistence
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger('quantpilot.ml.model_cache')
+
+MARKET_TZ = ZoneInfo('America/New_York')
+
+
+def seconds_until_market_close(now: Optional[datetime] = None) -> int:
+    """
+    Seconds until the next 4pm ET market close (weekends skipped)
+
+    Args:
+        now: Current time (defaults to now in market timezone)
+
+    Returns:
+        Seconds until close, at least 60
+    """
+    now = now or datetime.now(MARKET_TZ)
+    close = now.replace(hour=16, minute=0, second=0, microsecond=0)
+    if now >= close:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return max(60, int((close - now).total_seconds()))
+
+
+class ModelCache:
+    """LRU cache of trained model bundles, persisted to disk with joblib"""
+
+    def __init__(self, cache_dir: str = '.cache/models', max_entries: int = 32, max_files: int = 64):
+        """
+        Args:
+            cache_dir: Directory for persisted bundles (shared across worker processes)
+            max_entries: Maximum bundles kept in memory
+            max_files: Maximum bundles kept on disk
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self._entries: 'OrderedDict[str, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(symbol: str, closes: np.ndarray, market_closes: Optional[np.ndarray] = None) -> str:
+        """
+        Build a cache key from the symbol and a fingerprint of its price history
+
+        Args:
+            symbol: Stock/ETF ticker symbol
+            closes: Close prices the models are trained on
+            market_closes: SPY close prices used for market-relative features, if any
+
+        Returns:
+            Key of the form SYMBOL-<hex digest>
+        """
+        digest = hashlib.blake2b(np.ascontiguousarray(closes, dtype=np.float64).tobytes(), digest_size=8)
+        if market_closes is not None:
+            digest.update(np.ascontiguousarray(market_closes, dtype=np.float64).tobytes())
+        return f"{symbol}-{digest.hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def _remember(self, key: str, bundle: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (bundle, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_files(self):
+        """Remove the least recently used bundles beyond max_files from disk"""
+        try:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                     if name.endswith('.joblib')]
+        except OSError:
+            return
+        if len(paths) <= self.max_files:
+            return
+
+        def mtime(path: str) -> float:
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0.0
+
+        paths.sort(key=mtime, reverse=True)
+        for path in paths[self.max_files:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a model bundle from memory, falling back to disk
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Cached bundle or None if not found/expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+
+        path = self._path(key)
+        try:
+            # Bundles are stored uncompressed, so loading skips decompression.
+            # Each worker still holds its own copy: sklearn trees copy their
+            # arrays into the heap on unpickle, so memory-mapping wouldn't share them
+            expires_at, bundle = joblib.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("[ModelCache] Could not load %s: %s", key, e)
+            return None
+
+        if now >= expires_at:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            pass
+        self._remember(key, bundle, expires_at)
+        return bundle
+
+    def set(self, key: str, bundle: Any, ttl: Optional[int] = None):
+        """
+        Store a model bundle in memory and on disk
+
+        Args:
+            key: Cache key from make_key()
+            bundle: Trained models and associated metadata
+            ttl: Time to live in seconds (default: until next market close)
+        """
+        if ttl is None:
+            ttl = seconds_until_market_close()
+        expires_at = time.time() + ttl
+        self._remember(key, bundle, expires_at)
+
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so other workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            joblib.dump((expires_at, bundle), tmp_path, compress=0)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("[ModelCache] Could not persist %s: %s", key, e)
+            return
+        self._evict_files()
+
+
+# Global model cache instance
+model_cache = ModelCache(cache_dir=os.getenv('MODEL_CACHE_DIR', '.cache/models'))
@@ -3,17 +3,30 @@ Professional ML Models for Stock/ETF Price Prediction
 Uses industry-standard libraries: scikit-learn, statsmodels
 """
 
+import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 from sklearn.linear_model import Ridge, Lasso
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from joblib import Parallel, delayed
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from statsmodels.tsa.arima.model import ARIMA
+from numba import njit
 import warnings
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger('quantpilot.ml.models')
+
+# Threads one ensemble fit may use (-1: all cores); training worker processes set 1
+FIT_N_JOBS = -1
+
+
+def set_fit_n_jobs(n_jobs: int):
+    """Set FIT_N_JOBS for this process (ProcessPoolExecutor initializer)"""
+    global FIT_N_JOBS
+    FIT_N_JOBS = n_jobs
+
 
 class MLEnsemble:
     """Ensemble of multiple ML models for robust predictions"""
@@ -29,8 +42,8 @@ class MLEnsemble:
             random_state=42,
             n_jobs=-1
         )
-        self.gb_model = GradientBoostingRegressor(
-            n_estimators=100,
+        self.gb_model = HistGradientBoostingRegressor(
+            max_iter=100,
             max_depth=5,
             learning_rate=0.1,
             random_state=42
@@ -46,15 +59,22 @@ class MLEnsemble:
         Returns:
             Dictionary with training metrics
         """
-        print(f"[ML Models] Training with {len(X_train)} samples, {X_train.shape[1]} features")
+        logger.debug("[ML Models] Training with %d samples, %d features", len(X_train), X_train.shape[1])
 
         self.feature_names = X_train.columns.tolist()
 
-        # Train each model
-        self.linear_model.fit(X_train, y_train)
-        self.lasso_model.fit(X_train, y_train)
-        self.rf_model.fit(X_train, y_train)
-        self.gb_model.fit(X_train, y_train)
+        # Fit on the raw array so predict() can take plain ndarrays without
+        # sklearn's per-call feature-name validation
+        X_np = X_train.to_numpy(dtype=np.float32)
+
+        # Train each model concurrently (sklearn fit kernels release the GIL),
+        # within this process's FIT_N_JOBS thread budget
+        models = [self.linear_model, self.lasso_model, self.rf_model, self.gb_model]
+        self.rf_model.set_params(n_jobs=FIT_N_JOBS)
+        fit_jobs = len(models) if FIT_N_JOBS < 1 else min(len(models), FIT_N_JOBS)
+        Parallel(n_jobs=fit_jobs, backend='threading')(
+            delayed(model.fit)(X_np, y_train) for model in models
+        )
 
         self.is_trained = True
 
@@ -72,12 +92,23 @@ class MLEnsemble:
             'n_features': X_train.shape[1]
         }
 
-    def predict(self, X: pd.DataFrame, return_individual: bool = False) -> np.ndarray:
+    def _warmup(self, n_samples: int = 300, n_features: int = 40):
+        """Fit and predict on random data so compiled extensions are loaded before the first request"""
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(
+            rng.standard_normal((n_samples, n_features), dtype=np.float32),
+            columns=[f'f{i}' for i in range(n_features)]
+        )
+        y = pd.Series(rng.standard_normal(n_samples))
+        self.train(X, y)
+        self.predict_with_confidence(X.iloc[-1:])
+
+    def predict(self, X: Union[pd.DataFrame, np.ndarray], return_individual: bool = False) -> np.ndarray:
         """
         Generate ensemble prediction
 
         Args:
-            X: Features to predict on
+            X: Features to predict on (DataFrame or array in feature_names order)
             return_individual: If True, return predictions from each model
 
         Returns:
@@ -86,6 +117,9 @@ class MLEnsemble:
         if not self.is_trained:
             raise ValueError("Models not trained yet. Call train() first.")
 
+        if isinstance(X, pd.DataFrame):
+            X = X.to_numpy(dtype=np.float32)
+
         # Get predictions from each model
         lr_pred = self.linear_model.predict(X)
         lasso_pred = self.lasso_model.predict(X)
@@ -100,31 +134,24 @@ class MLEnsemble:
                 'gradient_boosting': gb_pred
             }
 
-        # Ensemble: weighted average
-        # Give more weight to tree-based models
-        ensemble = (
-            lr_pred * 0.2 +
-            lasso_pred * 0.15 +
-            rf_pred * 0.35 +
-            gb_pred * 0.3
-        )
-
-        return ensemble
+        return self._ensemble_from_individual({
+            'linear': lr_pred,
+            'lasso': lasso_pred,
+            'random_forest': rf_pred,
+            'gradient_boosting': gb_pred
+        })
 
     def get_feature_importance(self) -> Dict[str, float]:
-        """Get feature importance from tree-based models"""
+        """Get feature importance from the random forest"""
         if not self.is_trained:
             return {}
 
-        # Average importance from RF and GB
+        # HistGradientBoostingRegressor exposes no impurity-based importances
         rf_importance = self.rf_model.feature_importances_
-        gb_importance = self.gb_model.feature_importances_
-
-        avg_importance = (rf_importance + gb_importance) / 2
 
         importance_dict = {
             name: float(importance)
-            for name, importance in zip(self.feature_names, avg_importance)
+            for name, importance in zip(self.feature_names, rf_importance)
         }
 
         # Sort by importance
@@ -134,15 +161,42 @@ class MLEnsemble:
 
         return sorted_importance
 
-    def calculate_confidence(self, X: pd.DataFrame) -> np.ndarray:
+    def calculate_confidence(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """
         Calculate prediction confidence based on model agreement
 
         Returns:
             Array of confidence scores (0-1)
         """
+        return self._confidence_from_individual(self.predict(X, return_individual=True))
+
+    def predict_with_confidence(self, X: Union[pd.DataFrame, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ensemble predictions and confidence from a single pass over the models
+
+        Returns:
+            Tuple of (ensemble predictions, confidence scores)
+        """
         individual_preds = self.predict(X, return_individual=True)
+        return (
+            self._ensemble_from_individual(individual_preds),
+            self._confidence_from_individual(individual_preds)
+        )
+
+    @staticmethod
+    def _ensemble_from_individual(individual_preds: Dict[str, np.ndarray]) -> np.ndarray:
+        """Weighted average of individual model predictions"""
+        # Give more weight to tree-based models
+        return (
+            individual_preds['linear'] * 0.2 +
+            individual_preds['lasso'] * 0.15 +
+            individual_preds['random_forest'] * 0.35 +
+            individual_preds['gradient_boosting'] * 0.3
+        )
 
+    @staticmethod
+    def _confidence_from_individual(individual_preds: Dict[str, np.ndarray]) -> np.ndarray:
+        """Confidence scores from the spread of individual model predictions"""
         predictions = np.array([
             individual_preds['linear'],
             individual_preds['lasso'],
@@ -163,19 +217,65 @@ class MLEnsemble:
         return confidence
 
 
+@njit(cache=True)
+def _ar_forecast(coefs: np.ndarray, history: np.ndarray, steps: int) -> np.ndarray:
+    """Roll the AR recurrence forward (coefs: lag 1..p, then intercept)"""
+    p = coefs.shape[0] - 1
+    buf = np.empty(p + steps)
+    buf[:p] = history[-p:]
+    out = np.empty(steps)
+    for t in range(steps):
+        value = coefs[p]
+        for k in range(p):
+            value += coefs[k] * buf[p + t - 1 - k]
+        buf[p + t] = value
+        out[t] = value
+    return out
+
+
+class ARModel:
+    """AR(p) on daily price changes, fit by least squares with a JIT forecast loop"""
+
+    def __init__(self, order: int = 5):
+        self.order = order
+        self.coefs = None
+        self.diffs = None
+        self.last_price = None
+
+    def fit(self, prices: pd.Series) -> 'ARModel':
+        """Fit lag coefficients and drift on first differences of prices"""
+        values = np.asarray(prices, dtype=np.float64)
+        diffs = np.diff(values)
+        p = self.order
+
+        # Hankel rows [d(t-p) ... d(t)]: last column is the target, the rest are lags
+        windows = np.lib.stride_tricks.sliding_window_view(diffs, p + 1)
+        lags = windows[:, p - 1::-1]
+        design = np.column_stack([lags, np.ones(len(windows))])
+        self.coefs, *_ = np.linalg.lstsq(design, windows[:, p], rcond=None)
+
+        self.diffs = diffs[-p:].copy()
+        self.last_price = float(values[-1])
+        return self
+
+    def forecast(self, steps: int) -> np.ndarray:
+        """Forecast price path for the next `steps` days"""
+        return self.last_price + np.cumsum(_ar_forecast(self.coefs, self.diffs, steps))
+
+
 class TimeSeriesModels:
     """Time series models for multi-step forecasting"""
 
     def __init__(self):
         self.es_model = None
-        self.arima_model = None
+        self.ar_model = None
         self.prices = None
 
     def train(self, prices: pd.Series):
         """Train time series models on price history"""
         self.prices = prices
 
-        print(f"[Time Series] Training on {len(prices)} price points")
+        logger.debug("[Time Series] Training on %d price points", len(prices))
 
         # Exponential Smoothing (Holt's method with trend)
         try:
@@ -186,16 +286,15 @@ class TimeSeriesModels:
                 initialization_method="estimated"
             ).fit()
         except Exception as e:
-            print(f"[Time Series] Exponential Smoothing training failed: {e}")
+            logger.warning("[Time Series] Exponential Smoothing training failed: %s", e)
             self.es_model = None
 
-        # ARIMA model (auto-select best parameters)
+        # AR(5) on price changes (closed-form fit, JIT-compiled forecast)
         try:
-            # Use simple AR(5) model for speed
-            self.arima_model = ARIMA(prices, order=(5, 1, 2)).fit()
+            self.ar_model = ARModel(order=5).fit(prices)
         except Exception as e:
-            print(f"[Time Series] ARIMA training failed: {e}")
-            self.arima_model = None
+            logger.warning("[Time Series] AR training failed: %s", e)
+            self.ar_model = None
 
     def predict(self, steps: int = 1) -> Dict[str, float]:
         """
@@ -207,38 +306,120 @@ class TimeSeriesModels:
         Returns:
             Dictionary with predictions and confidence
         """
-        predictions = {}
+        return self.predict_multi([steps])[steps]
+
+    def predict_multi(self, steps_list: List[int]) -> Dict[int, Dict[str, float]]:
+        """
+        Forecast future prices for several horizons from a single forecast per model
+
+        Args:
+            steps_list: Horizons (days ahead) to predict
+
+        Returns:
+            Dictionary mapping each horizon to its predictions and confidence
+        """
+        max_steps = max(steps_list)
+        last_price = float(self.prices.iloc[-1])
 
-        # Exponential Smoothing prediction
+        # One forecast path per model, sliced at each horizon
+        es_path = None
         if self.es_model is not None:
             try:
-                es_forecast = self.es_model.forecast(steps=steps)
-                predictions['exponential_smoothing'] = float(es_forecast.iloc[-1])
+                es_path = np.asarray(self.es_model.forecast(steps=max_steps), dtype=float)
             except:
-                predictions['exponential_smoothing'] = float(self.prices.iloc[-1])
-        else:
-            predictions['exponential_smoothing'] = float(self.prices.iloc[-1])
+                es_path = None
 
-        # ARIMA prediction
-        if self.arima_model is not None:
+        ar_path = None
+        if self.ar_model is not None:
             try:
-                arima_forecast = self.arima_model.forecast(steps=steps)
-                predictions['arima'] = float(arima_forecast.iloc[-1] if hasattr(arima_forecast, 'iloc') else arima_forecast[-1])
+                ar_path = self.ar_model.forecast(max_steps)
             except:
-                predictions['arima'] = float(self.prices.iloc[-1])
-        else:
-            predictions['arima'] = float(self.prices.iloc[-1])
-
-        # Ensemble of time series models
-        predictions['ensemble'] = (
-            predictions['exponential_smoothing'] * 0.5 +
-            predictions['arima'] * 0.5
-        )
+                ar_path = None
+
+        results = {}
+        for steps in steps_list:
+            predictions = {
+                'exponential_smoothing': float(es_path[steps - 1]) if es_path is not None else last_price,
+                'autoregressive': float(ar_path[steps - 1]) if ar_path is not None else last_price
+            }
+
+            # Ensemble of time series models
+            predictions['ensemble'] = (
+                predictions['exponential_smoothing'] * 0.5 +
+                predictions['autoregressive'] * 0.5
+            )
+
+            # Confidence decreases with forecast horizon
+            predictions['confidence'] = max(0.5, 0.8 - (steps * 0.05))
+
+            results[steps] = predictions
+
+        return results
+
+
+def train_ml_ensemble(X_train: pd.DataFrame, y_train: pd.Series) -> Tuple[MLEnsemble, Dict[str, float]]:
+    """
+    Train a fresh ML ensemble
+
+    Module-level so it can be submitted to a process pool.
 
-        # Confidence decreases with forecast horizon
-        predictions['confidence'] = max(0.5, 0.8 - (steps * 0.05))
+    Returns:
+        Tuple of (trained ensemble, training metrics)
+    """
+    ml_ensemble = MLEnsemble()
+    train_metrics = ml_ensemble.train(X_train, y_train)
+    return ml_ensemble, train_metrics
+
+
+def train_time_series(prices: pd.Series) -> TimeSeriesModels:
+    """
+    Train fresh time series models on a price history
+
+    Module-level so it can be submitted to a process pool.
+    """
+    ts_models = TimeSeriesModels()
+    ts_models.train(prices)
+    return ts_models
 
-        return predictions
+
+@njit(cache=True)
+def _metrics(y: np.ndarray, yhat: np.ndarray) -> Tuple[float, float, float, float, float]:
+    """
+    Fused MAE, RMSE, MAPE, R² and directional accuracy over the test window
+
+    MAPE skips zero targets (flat days), which have no percentage error.
+    """
+    n = y.shape[0]
+    abs_sum = 0.0
+    sq_sum = 0.0
+    pct_sum = 0.0
+    pct_count = 0
+    y_sum = 0.0
+    same_direction = 0
+    for i in range(n):
+        e = y[i] - yhat[i]
+        abs_sum += abs(e)
+        sq_sum += e * e
+        if y[i] != 0.0:
+            pct_sum += abs(e / y[i])
+            pct_count += 1
+        y_sum += y[i]
+        if i > 0 and (y[i] > y[i - 1]) == (yhat[i] > yhat[i - 1]):
+            same_direction += 1
+
+    y_mean = y_sum / n
+    total_sq = 0.0
+    for i in range(n):
+        d = y[i] - y_mean
+        total_sq += d * d
+    if total_sq > 0.0:
+        r2 = 1.0 - sq_sum / total_sq
+    else:
+        r2 = 1.0 if sq_sum == 0.0 else 0.0
+
+    directional_accuracy = same_direction / (n - 1) * 100.0 if n > 1 else 50.0
+    mape = pct_sum / pct_count * 100.0 if pct_count > 0 else 0.0
+    return abs_sum / n, (sq_sum / n) ** 0.5, mape, r2, directional_accuracy
 
 
 def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
@@ -248,28 +429,17 @@ def evaluate_model(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
     Returns:
         Dictionary with MAE, RMSE, MAPE, R², and directional accuracy
     """
-    # Basic metrics
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-    r2 = r2_score(y_true, y_pred)
-
-    # MAPE (Mean Absolute Percentage Error)
-    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
-
-    # Directional Accuracy
-    if len(y_true) > 1:
-        actual_direction = np.diff(y_true) > 0
-        pred_direction = np.diff(y_pred) > 0
-        directional_accuracy = np.mean(actual_direction == pred_direction) * 100
-    else:
-        directional_accuracy = 50.0
+    mae, rmse, mape, r2, directional_accuracy = _metrics(
+        np.ascontiguousarray(y_true, dtype=np.float64),
+        np.ascontiguousarray(y_pred, dtype=np.float64)
+    )
 
     return {
-        'mae': float(mae),
-        'rmse': float(rmse),
-        'mape': float(mape),
-        'r2': float(r2),
-        'directional_accuracy': float(directional_accuracy)
+        'mae': mae,
+        'rmse': rmse,
+        'mape': mape,
+        'r2': r2,
+        'directional_accuracy': directional_accuracy
     }
 
 
@@ -8,13 +8,31 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import logging
+import threading
 import time
+from collections import OrderedDict
 from functools import lru_cache
 
+logger = logging.getLogger('quantpilot.ml.stock_data')
+
+# History cache key: (symbol, window start date, window end date), ISO dates
+HistoryKey = Tuple[str, str, str]
+
 
 class StockDataFetcher:
     """Handles all stock data fetching operations"""
 
+    # yf.Ticker memoizes .info/.fast_info internally, so keep tickers short-lived
+    TICKER_TTL = 60
+
+    # Shorter history requests are sliced from one cached frame of this many days
+    CANONICAL_DAYS = 730
+
+    # LRU bounds; the window in history keys moves daily, so old frames must age out
+    MAX_TICKERS = 256
+    MAX_HISTORIES = 64
+
     def __init__(self, cache_ttl: int = 300):
         """
         Initialize the stock data fetcher
@@ -23,6 +41,49 @@ class StockDataFetcher:
             cache_ttl: Cache time-to-live in seconds (default 5 minutes)
         """
         self.cache_ttl = cache_ttl
+        self._ticker_cache: 'OrderedDict[str, Tuple[yf.Ticker, float]]' = OrderedDict()
+        self._history_cache: 'OrderedDict[HistoryKey, Tuple[pd.DataFrame, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key, value, ttl: float, max_entries: int):
+        """
+        Store a (value, fetched_at) entry as most recently used (caller holds the lock)
+
+        Entries older than ttl are dropped first, then the least recently used
+        ones beyond max_entries.
+        """
+        now = time.time()
+        entries[key] = (value, now)
+        entries.move_to_end(key)
+        for stale_key in [k for k, (_, fetched_at) in entries.items() if now - fetched_at >= ttl]:
+            del entries[stale_key]
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def get_ticker(self, symbol: str) -> yf.Ticker:
+        """
+        Get a memoized yf.Ticker for a symbol
+
+        Args:
+            symbol: Stock/ETF ticker symbol
+
+        Returns:
+            yf.Ticker instance, reused for up to TICKER_TTL seconds
+        """
+        symbol = symbol.upper()
+        now = time.time()
+
+        with self._lock:
+            entry = self._ticker_cache.get(symbol)
+            if entry is not None and now - entry[1] < self.TICKER_TTL:
+                self._ticker_cache.move_to_end(symbol)
+                return entry[0]
+
+        ticker = yf.Ticker(symbol)
+        with self._lock:
+            self._remember(self._ticker_cache, symbol, ticker, self.TICKER_TTL, self.MAX_TICKERS)
+        return ticker
 
     def fetch_historical_data(
         self,
@@ -39,7 +100,7 @@ class StockDataFetcher:
             max_retries: Maximum number of retry attempts
 
         Returns:
-            DataFrame with columns: date, open, high, low, close, volume
+            DataFrame with columns: date (datetime64), open, high, low, close, volume
 
         Raises:
             ValueError: If no data is available or insufficient data
@@ -47,8 +108,17 @@ class StockDataFetcher:
         symbol = symbol.upper()
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
+        fetch_start, window = self._canonical_window(end_date, days)
 
-        print(f"[StockDataFetcher] Fetching {days} days of data for {symbol}")
+        # Serve repeated requests for any window up to CANONICAL_DAYS from one frame
+        cache_key: HistoryKey = (symbol,) + window
+        with self._lock:
+            entry = self._history_cache.get(cache_key)
+            if entry is not None and time.time() - entry[1] < self.cache_ttl:
+                self._history_cache.move_to_end(cache_key)
+                return self._slice_from(entry[0], start_date)
+
+        logger.debug("[StockDataFetcher] Fetching %d days of data for %s", (end_date - fetch_start).days, symbol)
 
         df = None
         for attempt in range(max_retries):
@@ -56,29 +126,29 @@ class StockDataFetcher:
                 # Try yf.download first (more reliable)
                 df = yf.download(
                     symbol,
-                    start=start_date,
+                    start=fetch_start,
                     end=end_date,
                     progress=False
                 )
 
                 if not df.empty:
-                    print(f"   ✓ Downloaded {len(df)} data points")
+                    logger.debug("[StockDataFetcher] Downloaded %d data points for %s", len(df), symbol)
                     break
 
                 # Fallback to Ticker method
-                print(f"   ⚠ Download returned no data, trying Ticker method...")
-                ticker = yf.Ticker(symbol)
-                df = ticker.history(start=start_date, end=end_date)
+                logger.debug("[StockDataFetcher] Download returned no data for %s, trying Ticker method", symbol)
+                ticker = self.get_ticker(symbol)
+                df = ticker.history(start=fetch_start, end=end_date)
 
                 if not df.empty:
-                    print(f"   ✓ Fetched {len(df)} data points via Ticker")
+                    logger.debug("[StockDataFetcher] Fetched %d data points for %s via Ticker", len(df), symbol)
                     break
 
-                print(f"   ⚠ Attempt {attempt + 1}/{max_retries} failed, retrying...")
+                logger.warning("[StockDataFetcher] Attempt %d/%d for %s returned no data, retrying", attempt + 1, max_retries, symbol)
                 time.sleep(2 ** attempt)
 
             except Exception as e:
-                print(f"   ⚠ Error on attempt {attempt + 1}/{max_retries}: {str(e)}")
+                logger.warning("[StockDataFetcher] Error on attempt %d/%d for %s: %s", attempt + 1, max_retries, symbol, e)
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)
                 else:
@@ -90,7 +160,88 @@ class StockDataFetcher:
         # Standardize DataFrame format
         df = self._standardize_dataframe(df)
 
-        return df
+        with self._lock:
+            self._remember(self._history_cache, cache_key, df, self.cache_ttl, self.MAX_HISTORIES)
+
+        return self._slice_from(df, start_date)
+
+    def fetch_historical_data_multi(self, symbols: List[str], days: int = 730) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch historical OHLCV data for several symbols in one batched download
+
+        Args:
+            symbols: Stock/ETF ticker symbols
+            days: Number of days of historical data (default 730 = 2 years)
+
+        Returns:
+            Dictionary mapping symbols to DataFrames in the same format as
+            fetch_historical_data(). Symbols the batch could not provide are
+            omitted so callers can fall back to fetch_historical_data().
+        """
+        symbols = [s.upper() for s in symbols]
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        fetch_start, window = self._canonical_window(end_date, days)
+
+        frames: Dict[str, pd.DataFrame] = {}
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                entry = self._history_cache.get((symbol,) + window)
+                if entry is not None and now - entry[1] < self.cache_ttl:
+                    self._history_cache.move_to_end((symbol,) + window)
+                    frames[symbol] = self._slice_from(entry[0], start_date)
+
+        missing = [s for s in symbols if s not in frames]
+        if missing:
+            logger.debug("[StockDataFetcher] Fetching %d days of data for %s", (end_date - fetch_start).days, ', '.join(missing))
+            try:
+                raw = yf.download(
+                    missing,
+                    start=fetch_start,
+                    end=end_date,
+                    group_by='ticker',
+                    threads=True,
+                    progress=False
+                )
+            except Exception as e:
+                logger.warning("[StockDataFetcher] Batched download failed: %s", e)
+                raw = None
+
+            if raw is not None and not raw.empty:
+                grouped = isinstance(raw.columns, pd.MultiIndex)
+                tickers = set(raw.columns.get_level_values(0)) if grouped else set(missing[:1])
+                for symbol in missing:
+                    if symbol not in tickers:
+                        continue
+                    # Single-ticker downloads may come back without the ticker level
+                    sub = (raw[symbol] if grouped else raw).dropna(how='all')
+                    if sub.empty:
+                        continue
+                    df = self._standardize_dataframe(sub)
+                    with self._lock:
+                        self._remember(self._history_cache, (symbol,) + window, df, self.cache_ttl, self.MAX_HISTORIES)
+                    frames[symbol] = self._slice_from(df, start_date)
+                    logger.debug("[StockDataFetcher] Downloaded %d data points for %s", len(df), symbol)
+
+        return frames
+
+    def _canonical_window(self, end_date: datetime, days: int) -> Tuple[datetime, Tuple[str, str]]:
+        """
+        Download start and history cache window for a request of `days` days
+
+        Requests up to CANONICAL_DAYS share a single window, so every endpoint
+        hits the same cached frame regardless of the history length it asks for.
+        """
+        fetch_start = end_date - timedelta(days=max(days, self.CANONICAL_DAYS))
+        return fetch_start, (fetch_start.date().isoformat(), end_date.date().isoformat())
+
+    @staticmethod
+    def _slice_from(df: pd.DataFrame, start_date: datetime) -> pd.DataFrame:
+        """Rows of a cached frame on or after start_date, as a new frame callers may mutate"""
+        dates = df['date'].to_numpy()
+        first = dates.searchsorted(np.datetime64(start_date), side='left')
+        return df.iloc[first:].reset_index(drop=True)
 
     def _standardize_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -106,17 +257,12 @@ class StockDataFetcher:
 
         # Handle MultiIndex columns from yf.download
         if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [col[0].lower() if isinstance(col, tuple) else col.lower() for col in df.columns]
-        else:
-            df.columns = [col.lower() if isinstance(col, str) else col for col in df.columns]
-
-        # Ensure date column exists
-        if 'date' not in df.columns and df.index.name == 'Date':
-            df = df.reset_index()
-            df.columns = [col.lower() for col in df.columns]
+            df.columns = df.columns.get_level_values(0)
+        df.columns = df.columns.str.lower()
 
-        # Format date as string
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        # Keep dates as naive datetime64; callers format them at the JSON boundary
+        if df['date'].dt.tz is not None:
+            df['date'] = df['date'].dt.tz_localize(None)
 
         # Ensure required columns exist
         required = ['date', 'open', 'high', 'low', 'close', 'volume']
@@ -137,10 +283,10 @@ class StockDataFetcher:
             Dictionary with current price and market data
         """
         symbol = symbol.upper()
-        print(f"[StockDataFetcher] Fetching quote for {symbol}")
+        logger.debug("[StockDataFetcher] Fetching quote for %s", symbol)
 
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = self.get_ticker(symbol)
             info = ticker.info
 
             # Extract quote data from info
@@ -153,7 +299,7 @@ class StockDataFetcher:
 
             quote_type = info.get('quoteType', 'EQUITY')
 
-            print(f"   ✓ Got quote: ${current_price:.2f} ({change_percent:+.2f}%)")
+            logger.debug("[StockDataFetcher] Got quote for %s: $%.2f (%+.2f%%)", symbol, current_price, change_percent)
 
             return {
                 'symbol': symbol,
@@ -186,10 +332,10 @@ class StockDataFetcher:
             Dictionary with fundamental metrics
         """
         symbol = symbol.upper()
-        print(f"[StockDataFetcher] Fetching fundamentals for {symbol}")
+        logger.debug("[StockDataFetcher] Fetching fundamentals for %s", symbol)
 
         try:
-            ticker = yf.Ticker(symbol)
+            ticker = self.get_ticker(symbol)
             info = ticker.info
 
             quote_type = info.get('quoteType', 'EQUITY')
@@ -5,7 +5,150 @@ Comprehensive technical analysis calculations
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _wilder_rsi_averages_nb(prices: np.ndarray, period: int):
+    """Wilder-smoothed average gain and loss at the last bar"""
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        change = prices[i] - prices[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= period
+    avg_loss /= period
+
+    for i in range(period + 1, prices.shape[0]):
+        change = prices[i] - prices[i - 1]
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return avg_gain, avg_loss
+
+
+@njit(cache=True, fastmath=True)
+def _wilder_sums_nb(tr: np.ndarray, plus_dm: np.ndarray, minus_dm: np.ndarray, period: int):
+    """Wilder-smoothed running sums of TR, +DM and -DM at the last bar"""
+    smooth_tr = 0.0
+    smooth_plus_dm = 0.0
+    smooth_minus_dm = 0.0
+    for i in range(period):
+        smooth_tr += tr[i]
+        smooth_plus_dm += plus_dm[i]
+        smooth_minus_dm += minus_dm[i]
+
+    for i in range(period, tr.shape[0]):
+        smooth_tr = smooth_tr - smooth_tr / period + tr[i]
+        smooth_plus_dm = smooth_plus_dm - smooth_plus_dm / period + plus_dm[i]
+        smooth_minus_dm = smooth_minus_dm - smooth_minus_dm / period + minus_dm[i]
+    return smooth_tr, smooth_plus_dm, smooth_minus_dm
+
+
+@njit(cache=True, fastmath=True)
+def _mean_deviation_nb(values: np.ndarray) -> float:
+    """Mean absolute deviation from the mean"""
+    mean = 0.0
+    for i in range(values.shape[0]):
+        mean += values[i]
+    mean /= values.shape[0]
+    total = 0.0
+    for i in range(values.shape[0]):
+        total += abs(values[i] - mean)
+    return total / values.shape[0]
+
+
+@njit(cache=True)
+def _timeseries_nb(close: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    Per-bar MACD, signal, Bollinger Bands, Stochastic %K and RSI in one pass
+
+    Values are NaN until enough history exists (MACD 26 bars, signal 34,
+    Bollinger 20, Stochastic 14, RSI 15). The signal line is an EMA of the
+    MACD series starting at its first value.
+    """
+    n = close.shape[0]
+    macd = np.full(n, np.nan)
+    signal = np.full(n, np.nan)
+    bb_upper = np.full(n, np.nan)
+    bb_middle = np.full(n, np.nan)
+    bb_lower = np.full(n, np.nan)
+    stochastic = np.full(n, np.nan)
+    rsi = np.full(n, np.nan)
+
+    alpha_12 = 2.0 / 13.0
+    alpha_26 = 2.0 / 27.0
+    alpha_9 = 2.0 / 10.0
+    ema_12 = close[0] if n > 0 else 0.0
+    ema_26 = ema_12
+    signal_ema = 0.0
+
+    for i in range(n):
+        if i > 0:
+            ema_12 = alpha_12 * close[i] + (1 - alpha_12) * ema_12
+            ema_26 = alpha_26 * close[i] + (1 - alpha_26) * ema_26
+
+        # MACD - need at least 26 periods; signal needs 34 (26 + 9)
+        if i >= 26:
+            macd_val = ema_12 - ema_26
+            macd[i] = macd_val
+            if i == 26:
+                signal_ema = macd_val
+            else:
+                signal_ema = alpha_9 * macd_val + (1 - alpha_9) * signal_ema
+            if i >= 34:
+                signal[i] = signal_ema
+
+        # Bollinger Bands (population std) - need at least 20 periods
+        if i >= 19:
+            mean = 0.0
+            for j in range(i - 19, i + 1):
+                mean += close[j]
+            mean /= 20
+            var = 0.0
+            for j in range(i - 19, i + 1):
+                var += (close[j] - mean) ** 2
+            std = np.sqrt(var / 20)
+            bb_upper[i] = mean + 2 * std
+            bb_middle[i] = mean
+            bb_lower[i] = mean - 2 * std
+
+        # Stochastic - need at least 14 periods
+        if i >= 13:
+            high_14 = high[i - 13]
+            low_14 = low[i - 13]
+            for j in range(i - 12, i + 1):
+                high_14 = max(high_14, high[j])
+                low_14 = min(low_14, low[j])
+            if high_14 - low_14 > 0:
+                stochastic[i] = (close[i] - low_14) / (high_14 - low_14) * 100
+
+        # RSI (simple average of the last 14 changes)
+        if i >= 14:
+            gains = 0.0
+            losses = 0.0
+            for j in range(i - 13, i + 1):
+                change = close[j] - close[j - 1]
+                if change > 0:
+                    gains += change
+                elif change < 0:
+                    losses -= change
+            if losses == 0:
+                rsi[i] = 100.0
+            else:
+                rsi[i] = 100 - (100 / (1 + (gains / 14) / (losses / 14)))
+
+    return macd, signal, bb_upper, bb_middle, bb_lower, stochastic, rsi
+
+
+def _nan_to_none(values: np.ndarray) -> List[Any]:
+    """NaN -> None for JSON nulls"""
+    return [None if v != v else v for v in values.tolist()]
 
 
 class TechnicalIndicators:
@@ -51,18 +194,8 @@ class TechnicalIndicators:
         if len(prices) < period + 1:
             return {'value': 50.0, 'signal': 'neutral', 'description': 'Insufficient data for RSI'}
 
-        # Calculate price changes
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-
         # Wilder's smoothing
-        avg_gain = np.mean(gains[:period])
-        avg_loss = np.mean(losses[:period])
-
-        for i in range(period, len(gains)):
-            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        avg_gain, avg_loss = _wilder_rsi_averages_nb(np.asarray(prices, dtype=np.float64), period)
 
         rs = avg_gain / avg_loss if avg_loss != 0 else 100
         rsi = 100 - (100 / (1 + rs))
@@ -78,7 +211,7 @@ class TechnicalIndicators:
             signal = 'neutral'
             description = f'RSI at {rsi:.2f} is in neutral territory'
 
-        return {'value': float(rsi), 'signal': signal, 'description': description}
+        return {'value': rsi, 'signal': signal, 'description': description}
 
     @staticmethod
     def calculate_macd(prices: np.ndarray, fast: int = 12, slow: int = 26, signal_period: int = 9) -> Dict[str, Any]:
@@ -99,9 +232,9 @@ class TechnicalIndicators:
         signal_line = macd_line.ewm(span=signal_period, adjust=False).mean()
         histogram = macd_line - signal_line
 
-        macd_val = float(macd_line.iloc[-1])
-        signal_val = float(signal_line.iloc[-1])
-        hist_val = float(histogram.iloc[-1])
+        macd_val = macd_line.iloc[-1]
+        signal_val = signal_line.iloc[-1]
+        hist_val = histogram.iloc[-1]
 
         # Determine trend
         if hist_val > 0 and macd_val > signal_val:
@@ -141,9 +274,9 @@ class TechnicalIndicators:
         lower = sma - (std * num_std)
 
         current_price = prices[-1]
-        upper_val = float(upper.iloc[-1])
-        middle_val = float(sma.iloc[-1])
-        lower_val = float(lower.iloc[-1])
+        upper_val = upper.iloc[-1]
+        middle_val = sma.iloc[-1]
+        lower_val = lower.iloc[-1]
         bandwidth = ((upper_val - lower_val) / middle_val) * 100 if middle_val > 0 else 0
 
         # Determine position
@@ -212,8 +345,8 @@ class TechnicalIndicators:
         k = 100 * (df['close'] - low_min) / (high_max - low_min)
         d = k.rolling(window=d_period).mean()
 
-        k_val = float(k.iloc[-1]) if not pd.isna(k.iloc[-1]) else 50.0
-        d_val = float(d.iloc[-1]) if not pd.isna(d.iloc[-1]) else 50.0
+        k_val = k.iloc[-1] if not pd.isna(k.iloc[-1]) else 50.0
+        d_val = d.iloc[-1] if not pd.isna(d.iloc[-1]) else 50.0
 
         # Determine signal
         if k_val < 20:
@@ -237,7 +370,7 @@ class TechnicalIndicators:
         typical_price = (df['high'] + df['low'] + df['close']) / 3
         vwap = (typical_price * df['volume']).sum() / df['volume'].sum() if df['volume'].sum() > 0 else 0
 
-        current_price = df['close'].iloc[-1]
+        current_price = df['close'].to_numpy()[-1]
         position = 'above' if current_price > vwap else 'below'
 
         description = (
@@ -273,14 +406,9 @@ class TechnicalIndicators:
         minus_dm = np.where((low[:-1] - low[1:]) > (high[1:] - high[:-1]), np.maximum(low[:-1] - low[1:], 0), 0)
 
         # Smooth TR, +DM, -DM
-        smooth_tr = np.sum(tr[:period])
-        smooth_plus_dm = np.sum(plus_dm[:period])
-        smooth_minus_dm = np.sum(minus_dm[:period])
-
-        for i in range(period, len(tr)):
-            smooth_tr = smooth_tr - smooth_tr / period + tr[i]
-            smooth_plus_dm = smooth_plus_dm - smooth_plus_dm / period + plus_dm[i]
-            smooth_minus_dm = smooth_minus_dm - smooth_minus_dm / period + minus_dm[i]
+        smooth_tr, smooth_plus_dm, smooth_minus_dm = _wilder_sums_nb(
+            tr.astype(np.float64), plus_dm.astype(np.float64), minus_dm.astype(np.float64), period
+        )
 
         # Calculate DI+ and DI-
         plus_di = (smooth_plus_dm / smooth_tr) * 100 if smooth_tr > 0 else 0
@@ -317,7 +445,7 @@ class TechnicalIndicators:
         recent_df = df.iloc[-period:]
         highest_high = recent_df['high'].max()
         lowest_low = recent_df['low'].min()
-        current_close = df['close'].iloc[-1]
+        current_close = df['close'].to_numpy()[-1]
 
         williams_r = ((highest_high - current_close) / (highest_high - lowest_low)) * -100 if (highest_high - lowest_low) > 0 else -50
 
@@ -340,13 +468,12 @@ class TechnicalIndicators:
         if len(df) < period:
             return {'value': 0.0, 'signal': 'neutral', 'description': 'Insufficient data for CCI'}
 
-        typical_price = (df['high'] + df['low'] + df['close']) / 3
-        sma_tp = typical_price.rolling(window=period).mean()
-        mean_deviation = typical_price.rolling(window=period).apply(lambda x: np.mean(np.abs(x - x.mean())))
+        typical_price = ((df['high'] + df['low'] + df['close']) / 3).to_numpy(dtype=np.float64)
+        window = typical_price[-period:]
 
-        current_tp = typical_price.iloc[-1]
-        current_sma = sma_tp.iloc[-1]
-        current_md = mean_deviation.iloc[-1]
+        current_tp = typical_price[-1]
+        current_sma = window.mean()
+        current_md = _mean_deviation_nb(window)
 
         cci = (current_tp - current_sma) / (0.015 * current_md) if current_md > 0 else 0
 
@@ -446,82 +573,50 @@ class TechnicalIndicators:
         Returns:
             List of dictionaries with date and indicator values for each point
         """
-        close_prices = df['close'].values
-        high_prices = df['high'].values
-        low_prices = df['low'].values
-        volume = df['volume'].values
-        dates = df['date'].values
-
-        timeseries_data = []
-
-        for i in range(len(df)):
-            point = {
-                'date': str(dates[i]),
-                'price': float(close_prices[i]),
-                'volume': float(volume[i]),
-                'macd': None,
-                'signal': None,
-                'histogram': None,
-                'bollinger_upper': None,
-                'bollinger_middle': None,
-                'bollinger_lower': None,
-                'stochastic': None,
-                'rsi': None
-            }
+        return list(TechnicalIndicators.iter_timeseries(df))
 
-            # MACD - need at least 26 periods
-            if i >= 26:
-                prices_slice = close_prices[:i+1]
-                prices_series = pd.Series(prices_slice)
-                ema12 = float(prices_series.ewm(span=12, adjust=False).mean().iloc[-1])
-                ema26 = float(prices_series.ewm(span=26, adjust=False).mean().iloc[-1])
-                macd_val = ema12 - ema26
-                point['macd'] = macd_val
-
-                # Signal line - need at least 34 periods (26 + 9)
-                if i >= 34:
-                    # Calculate MACD for all previous points to get signal line
-                    macd_values = []
-                    for j in range(26, i+1):
-                        p_slice = pd.Series(close_prices[:j+1])
-                        e12 = p_slice.ewm(span=12, adjust=False).mean().iloc[-1]
-                        e26 = p_slice.ewm(span=26, adjust=False).mean().iloc[-1]
-                        macd_values.append(e12 - e26)
-
-                    signal_val = float(pd.Series(macd_values).ewm(span=9, adjust=False).mean().iloc[-1])
-                    point['signal'] = signal_val
-                    point['histogram'] = macd_val - signal_val
-
-            # Bollinger Bands - need at least 20 periods
-            if i >= 19:
-                prices_slice = close_prices[i-19:i+1]
-                sma20 = np.mean(prices_slice)
-                std20 = np.std(prices_slice)
-                point['bollinger_upper'] = float(sma20 + 2 * std20)
-                point['bollinger_middle'] = float(sma20)
-                point['bollinger_lower'] = float(sma20 - 2 * std20)
-
-            # Stochastic - need at least 14 periods
-            if i >= 13:
-                high_14 = np.max(high_prices[i-13:i+1])
-                low_14 = np.min(low_prices[i-13:i+1])
-                if high_14 - low_14 > 0:
-                    point['stochastic'] = float(((close_prices[i] - low_14) / (high_14 - low_14)) * 100)
-
-            # RSI - need at least 14 periods
-            if i >= 14:
-                changes = np.diff(close_prices[i-14:i+1])
-                gains = np.where(changes > 0, changes, 0)
-                losses = np.where(changes < 0, -changes, 0)
-                avg_gain = np.mean(gains)
-                avg_loss = np.mean(losses)
-
-                if avg_loss == 0:
-                    point['rsi'] = 100.0
-                else:
-                    rs = avg_gain / avg_loss
-                    point['rsi'] = float(100 - (100 / (1 + rs)))
-
-            timeseries_data.append(point)
-
-        return timeseries_data
+    @staticmethod
+    def iter_timeseries(df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the calculate_timeseries() rows one at a time
+
+        Indicator columns are computed up front in one kernel pass; only the
+        per-point dictionaries are built lazily, so callers can stream them.
+
+        Args:
+            df: DataFrame with OHLCV data
+
+        Yields:
+            Dictionary with date and indicator values for one point
+        """
+        macd, signal, bb_upper, bb_middle, bb_lower, stochastic, rsi = _timeseries_nb(
+            df['close'].to_numpy(dtype=np.float64),
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64)
+        )
+
+        columns = {
+            'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d').tolist(),
+            'price': df['close'].tolist(),
+            'volume': df['volume'].astype(np.float64).tolist(),
+            'macd': _nan_to_none(macd),
+            'signal': _nan_to_none(signal),
+            'histogram': _nan_to_none(macd - signal),
+            'bollinger_upper': _nan_to_none(bb_upper),
+            'bollinger_middle': _nan_to_none(bb_middle),
+            'bollinger_lower': _nan_to_none(bb_lower),
+            'stochastic': _nan_to_none(stochastic),
+            'rsi': _nan_to_none(rsi),
+        }
+        keys = list(columns)
+        for row in zip(*columns.values()):
+            yield dict(zip(keys, row))
+
+
+# Compile (or load cached) kernels at import so the first request doesn't pay for it
+_warm = np.linspace(1.0, 2.0, 40)
+_wilder_rsi_averages_nb(_warm, 14)
+_wilder_sums_nb(_warm, _warm, _warm, 14)
+_mean_deviation_nb(_warm)
+_timeseries_nb(_warm, _warm, _warm)
+del _warm
@@ -16,7 +16,7 @@ start_date = end_date - timedelta(days=730)
 ticker = yf.Ticker(symbol)
 df = ticker.history(start=start_date, end=end_date)
 df = df.reset_index()
-df.columns = [col.lower() for col in df.columns]
+df.columns = df.columns.str.lower()
 df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
 
 print(f"Total data points: {len(df)}")
@@ -51,8 +51,7 @@ model = MLEnsemble()
 model.train(X_normalized.iloc[:split_idx], y_train)
 
 # Get predictions (returns)
-test_predictions = model.predict(X_test)
-test_confidence = model.calculate_confidence(X_test)
+test_predictions, test_confidence = model.predict_with_confidence(X_test)
 
 print(f"\nTest predictions (returns):")
 print(f"Predictions shape: {test_predictions.shape}")
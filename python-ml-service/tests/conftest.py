@@ -0,0 +1,35 @@
+"""
+Shared fixtures for the ML service tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Service modules are imported top-level (as app.py does)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def price_frames():
+    """Deterministic OHLCV frame for a stock and a SPY close series, 300 bars"""
+    rng = np.random.default_rng(1)
+    n = 300
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.015, n))
+    df = pd.DataFrame({
+        'date': pd.date_range('2022-01-01', periods=n),
+        'open': close * (1 + rng.normal(0, 0.005, n)),
+        'high': close * (1 + rng.uniform(0, 0.02, n)),
+        'low': close * (1 - rng.uniform(0, 0.02, n)),
+        'close': close,
+        'volume': rng.uniform(1e6, 2e6, n)
+    })
+    spy_close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    spy_df = pd.DataFrame({
+        'open': spy_close, 'high': spy_close, 'low': spy_close,
+        'close': spy_close, 'volume': np.ones(n)
+    })
+    return df, spy_df
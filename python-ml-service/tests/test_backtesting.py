@@ -0,0 +1,129 @@
+"""
+Backtester (numba _simulate and vectorized metrics) against the pure-Python loop it replaced
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtesting import Backtester
+
+
+def simulate_reference(prices, predictions, confidence, dates, commission=0.001, initial_capital=10000.0):
+    """Previous run_backtest trading loop (with the 10-bars-after-entry time exit)"""
+    cash = initial_capital
+    shares = 0
+    position = None
+    entry_price = 0
+    last_buy_bar = -1
+    trades = []
+    portfolio_values = []
+    daily_returns = []
+
+    for i in range(len(predictions) - 1):
+        current_price = prices[i]
+        expected_return = predictions[i]
+        predicted_price = current_price * (1 + expected_return)
+        pred_confidence = confidence[i]
+
+        current_value = cash + shares * current_price
+        portfolio_values.append(current_value)
+        if i > 0:
+            daily_returns.append((current_value - portfolio_values[i - 1]) / portfolio_values[i - 1])
+
+        if expected_return > 0.002 and pred_confidence >= 0.60 and position != 'LONG':
+            if cash > 0:
+                shares = cash / (current_price * (1 + commission))
+                cash = 0
+                position = 'LONG'
+                entry_price = current_price
+                last_buy_bar = i
+                trades.append((dates[i], 'BUY', current_price, shares, predicted_price, pred_confidence, 0.0, None))
+
+        elif position == 'LONG' and shares > 0:
+            sell_reason = None
+            if current_price >= entry_price * 1.02:
+                sell_reason = 'take_profit'
+            elif current_price <= entry_price * 0.985:
+                sell_reason = 'stop_loss'
+            elif expected_return < -0.002 and pred_confidence >= 0.60:
+                sell_reason = 'bearish_signal'
+            elif i - last_buy_bar >= 10:
+                sell_reason = 'time_exit'
+
+            if sell_reason:
+                sell_price = current_price * (1 - commission)
+                profit = shares * (sell_price - entry_price * (1 + commission))
+                cash = shares * sell_price
+                shares = 0
+                position = None
+                trades.append((dates[i], 'SELL', current_price, 0.0, predicted_price, pred_confidence, profit, sell_reason))
+
+    if shares > 0:
+        final_price = prices[-1]
+        sell_price = final_price * (1 - commission)
+        profit = shares * (sell_price - entry_price * (1 + commission))
+        cash = shares * sell_price
+        trades.append((dates[-1], 'SELL', final_price, 0.0, final_price, 0.5, profit, 'final_exit'))
+
+    portfolio_values.append(cash)
+    return trades, portfolio_values, daily_returns, cash
+
+
+def max_drawdown_reference(portfolio_values, initial_capital):
+    """Previous running-peak drawdown loop"""
+    max_drawdown = 0
+    peak = initial_capital
+    for value in portfolio_values:
+        if value > peak:
+            peak = value
+        drawdown = (peak - value) / peak if peak > 0 else 0
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+    return max_drawdown
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_backtest_matches_reference_loop(price_frames, seed):
+    df, _ = price_frames
+    rng = np.random.default_rng(seed)
+    n = 150
+    prices = df['close'].to_numpy()[-n:]
+    dates = df['date'].iloc[-n:].dt.strftime('%Y-%m-%d').tolist()
+    predictions = rng.normal(0, 0.006, n)
+    confidence = rng.uniform(0.4, 1.0, n)
+
+    backtester = Backtester()
+    result = backtester.run_backtest(
+        None, pd.DataFrame(index=range(n)), prices, dates, predictions=(predictions, confidence)
+    )
+
+    trades_ref, values_ref, returns_ref, final_ref = simulate_reference(prices, predictions, confidence, dates)
+    trades = result['trades']
+
+    assert len(trades_ref) > 2
+    assert _trades_match(trades, trades_ref)
+    assert result['final_value'] == pytest.approx(final_ref, rel=1e-12)
+
+    metrics = result['metrics']
+    assert metrics['max_drawdown'] == pytest.approx(max_drawdown_reference(values_ref, 10000.0) * 100, rel=1e-12)
+    assert metrics['sharpe_ratio'] == pytest.approx(np.mean(returns_ref) / np.std(returns_ref) * np.sqrt(252), rel=1e-9)
+    sell_profits = [t[6] for t in trades_ref if t[1] == 'SELL']
+    assert metrics['num_trades'] == len(trades_ref)
+    assert metrics['num_wins'] == sum(p > 0 for p in sell_profits)
+    assert metrics['num_losses'] == sum(p < 0 for p in sell_profits)
+
+
+def _trades_match(trades, trades_ref):
+    """Row-by-row trade comparison (floats to 1e-12 relative, missing reasons as NA, other fields exact)"""
+    for row, ref in zip(trades.itertuples(index=False, name=None), trades_ref):
+        for value, expected in zip(row, ref):
+            if expected is None:
+                if not pd.isna(value):
+                    return False
+            elif isinstance(expected, float):
+                if value != pytest.approx(expected, rel=1e-12):
+                    return False
+            elif value != expected:
+                return False
+    return len(trades) == len(trades_ref)
@@ -0,0 +1,50 @@
+"""
+engineer_dataset (batched) against the per-row extract_features loop it replaced
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_engineering import WARMUP_BARS, engineer_dataset, extract_features
+
+
+def engineer_dataset_rowwise(df, look_forward=1, spy_df=None):
+    """Previous engineer_dataset: one extract_features call per row"""
+    features, targets, dates, prices = [], [], [], []
+    for i in range(WARMUP_BARS, len(df) - look_forward):
+        spy_slice = spy_df.iloc[:i + 1] if spy_df is not None else None
+        features.append(extract_features(df, i, spy_df=spy_slice))
+        current_price = df.iloc[i]['close']
+        future_price = df.iloc[i + look_forward]['close']
+        targets.append((future_price - current_price) / current_price)
+        prices.append(current_price)
+        dates.append(df.iloc[i]['date'].strftime('%Y-%m-%d'))
+    return pd.DataFrame(features), pd.Series(targets), dates, pd.Series(prices)
+
+
+@pytest.mark.parametrize('with_spy', [False, True])
+@pytest.mark.parametrize('look_forward', [1, 5])
+def test_engineer_dataset_matches_rowwise(price_frames, with_spy, look_forward):
+    df, spy_df = price_frames
+    spy_df = spy_df if with_spy else None
+
+    X, y, dates, prices = engineer_dataset(df, look_forward=look_forward, spy_df=spy_df)
+    X_ref, y_ref, dates_ref, prices_ref = engineer_dataset_rowwise(df, look_forward, spy_df)
+
+    assert list(X.columns) == list(X_ref.columns)
+    np.testing.assert_allclose(X.to_numpy(), X_ref.to_numpy(), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(y.to_numpy(), y_ref.to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(prices.to_numpy(), prices_ref.to_numpy(), rtol=1e-12)
+    assert dates == dates_ref
+
+
+def test_engineer_dataset_include_last_matches_live_features(price_frames):
+    df, spy_df = price_frames
+
+    X, y, _, _ = engineer_dataset(df, look_forward=1, spy_df=spy_df, include_last=True)
+    live = extract_features(df, len(df) - 1, spy_df=spy_df)
+
+    assert list(X.columns) == list(live)
+    np.testing.assert_allclose(X.iloc[-1].to_numpy(), np.array(list(live.values())), rtol=1e-9, atol=1e-12)
+    assert np.isnan(y.iloc[-1])
@@ -0,0 +1,50 @@
+"""
+evaluate_model (fused numba metrics) against the sklearn/numpy metrics it replaced
+"""
+
+import numpy as np
+import pytest
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from models import evaluate_model
+
+
+def evaluate_reference(y_true, y_pred):
+    """Previous sklearn/numpy metrics, with MAPE over non-zero targets"""
+    nonzero = y_true != 0
+    return {
+        'mae': mean_absolute_error(y_true, y_pred),
+        'rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
+        'mape': np.mean(np.abs((y_true - y_pred)[nonzero] / y_true[nonzero])) * 100,
+        'r2': r2_score(y_true, y_pred),
+        'directional_accuracy': np.mean((np.diff(y_true) > 0) == (np.diff(y_pred) > 0)) * 100
+    }
+
+
+def test_evaluate_model_matches_reference():
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(0, 0.01, 100)
+    y_pred = y_true + rng.normal(0, 0.005, 100)
+
+    metrics = evaluate_model(y_true, y_pred)
+
+    for name, expected in evaluate_reference(y_true, y_pred).items():
+        assert metrics[name] == pytest.approx(expected, rel=1e-9)
+
+
+def test_evaluate_model_zero_return():
+    # An unchanged close is a 0% daily return; MAPE must skip it, not raise
+    y_true = np.array([0.01, 0.0, -0.02, 0.03])
+    y_pred = np.array([0.012, 0.001, -0.01, 0.02])
+
+    metrics = evaluate_model(y_true, y_pred)
+
+    assert all(np.isfinite(value) for value in metrics.values())
+    for name, expected in evaluate_reference(y_true, y_pred).items():
+        assert metrics[name] == pytest.approx(expected, rel=1e-9)
+
+
+def test_evaluate_model_all_zero_returns():
+    metrics = evaluate_model(np.zeros(3), np.array([0.01, -0.01, 0.0]))
+
+    assert metrics['mape'] == 0.0